@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Time comparing families: equal ones (built in different orders),
+which need the full comparison, and ones differing by a single
+relation, which the fingerprints tell apart.
+
+    python benchmarks/bench_family_eq.py
+    python benchmarks/bench_family_eq.py --people 10000 100000
+"""
+
+import argparse
+import time
+
+from pedigree import pedigree_lib
+from pedigree.synthetic import synthetic_big_dict
+
+
+def time_eq(one, other, repeat=5):
+  start = time.perf_counter()
+  for _ in range(repeat):
+    result = one == other
+  return (time.perf_counter() - start) / repeat, result
+
+
+def new_spouses(family):
+  """Someone and another person who isn't their spouse yet"""
+  one = family.uid_to_person(family.uids()[0])
+  for other in family.persons():
+    if other.uid != one.uid \
+        and not family.graph.has_edge(one, other, "spouse") \
+        and not family.graph.has_edge(other, one, "spouse"):
+      return one, other
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__,
+      formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--people", type=int, nargs="+",
+      default=[10000, 100000],
+      help="family sizes to compare")
+  args = parser.parse_args()
+
+  print(f"{'people':>8} {'equal s':>9} {'different s':>12}")
+  for num_people in args.people:
+    big_dict = synthetic_big_dict(num_people)
+    family = pedigree_lib.dict_to_family(big_dict)
+    same = pedigree_lib.dict_to_family(
+        {key: list(reversed(value)) for key, value in big_dict.items()})
+    different = pedigree_lib.dict_to_family(big_dict)
+    different.add_spouse(*new_spouses(different))
+
+    equal_time, equal = time_eq(family, same)
+    different_time, not_equal = time_eq(family, different)
+    assert equal and not not_equal
+    print(f"{num_people:>8} {equal_time:>9.4f} {different_time:>12.6f}")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,80 @@
+#!/usr/bin/env python3
+"""
+Compare Family's graph backends: time to build a family, memory
+held by it, time for every accessor over every person, and time to
+run both output generators, on synthetic families (see
+pedigree.synthetic).
+
+    python benchmarks/bench_graph_backends.py
+    python benchmarks/bench_graph_backends.py --people 10000 100000
+"""
+
+import argparse
+import gc
+import time
+import tracemalloc
+
+from pedigree import pedigree_lib
+from pedigree.synthetic import synthetic_big_dict
+
+
+def time_queries(family):
+  start = time.perf_counter()
+  for person in family.persons():
+    family.father(person)
+    family.mother(person)
+    family.children(person)
+    family.all_spouses(person)
+  family.fathers()
+  family.mothers()
+  family.spouses()
+  return time.perf_counter() - start
+
+
+def time_generators(family):
+  start = time.perf_counter()
+  for liny_style in (("both", "full name"),):
+    for _ in pedigree_lib.dot_file_generator(family, *liny_style):
+      pass
+    for _ in pedigree_lib.d3_html_page_generator(family, *liny_style):
+      pass
+  return time.perf_counter() - start
+
+
+def bench(backend, big_dict):
+  gc.collect()
+  tracemalloc.start()
+  start = time.perf_counter()
+  family = pedigree_lib.dict_to_family(big_dict, backend)
+  build_time = time.perf_counter() - start
+  memory = tracemalloc.get_traced_memory()[0]
+  tracemalloc.stop()
+  return build_time, memory, time_queries(family), time_generators(family)
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__,
+      formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--people", type=int, nargs="+",
+      default=[10000, 100000],
+      help="family sizes to compare")
+  args = parser.parse_args()
+
+  start = time.perf_counter()
+  import networkx
+  print(f"import networkx: {time.perf_counter() - start:.3f} s\n")
+
+  print(f"{'people':>8} {'backend':>9} {'build s':>8} {'MiB':>7} "
+      f"{'queries s':>10} {'generate s':>11}")
+  for num_people in args.people:
+    big_dict = synthetic_big_dict(num_people)
+    for backend in sorted(pedigree_lib.GRAPH_BACKENDS):
+      build_time, memory, query_time, generate_time = bench(backend,
+          big_dict)
+      print(f"{num_people:>8} {backend:>9} {build_time:>8.3f} "
+          f"{memory / 2**20:>7.1f} {query_time:>10.3f} "
+          f"{generate_time:>11.3f}")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+"""
+Time a cold `import pedigree.main` in fresh interpreters, over and
+above the interpreter's own startup, and exit non-zero if it's over
+`--threshold` milliseconds or if any module that should only be
+imported on demand got imported.
+
+    python benchmarks/bench_import_time.py
+    python benchmarks/bench_import_time.py --threshold 30 --runs 20
+"""
+
+import argparse
+import subprocess
+import sys
+import time
+
+
+# Modules pedigree only needs for particular subcommands
+DEFERRED_MODULES = ("toml", "networkx", "pickle", "subprocess",
+    "webbrowser", "tempfile", "urllib.request", "hashlib")
+
+
+def best_time(code, runs):
+  best = None
+  for _ in range(runs):
+    start = time.perf_counter()
+    subprocess.run([sys.executable, "-c", code], check=True)
+    elapsed = time.perf_counter() - start
+    if best == None or elapsed < best:
+      best = elapsed
+  return best
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__,
+      formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--runs", type=int, default=10,
+      help="take the best of this many fresh interpreters")
+  parser.add_argument("--threshold", type=float, default=50.0,
+      help="fail if importing takes longer than this many ms")
+  args = parser.parse_args()
+
+  baseline = best_time("pass", args.runs)
+  with_import = best_time("import pedigree.main", args.runs)
+  import_ms = 1000 * (with_import - baseline)
+  print(f"interpreter startup:  {1000 * baseline:7.1f} ms")
+  print(f"import pedigree.main: {import_ms:7.1f} ms "
+      f"(threshold {args.threshold:.1f} ms)")
+
+  loaded = subprocess.run([sys.executable, "-c",
+      "import sys, pedigree.main\n"
+      f"print(' '.join(m for m in {DEFERRED_MODULES!r} if m in sys.modules))"],
+      check=True, capture_output=True, text=True).stdout.split()
+
+  failed = False
+  if loaded:
+    print("imported eagerly: " + ", ".join(loaded))
+    failed = True
+  if import_ms > args.threshold:
+    print("import time is over the threshold")
+    failed = True
+  sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+  main()
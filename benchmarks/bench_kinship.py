@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+"""
+Time Family.kinship_matrix and Family.kinship_blocks on synthetic
+pedigrees born in generations (see pedigree.synthetic).
+
+The matrix is computed for a sample of the youngest generation, so
+the calculation also takes in all of their ancestors.  The blocks
+are the first few of the whole population's matrix.
+
+    python benchmarks/bench_kinship.py
+    python benchmarks/bench_kinship.py --people 10000 100000 --sample 3000
+"""
+
+import argparse
+import time
+
+from pedigree import pedigree_lib
+from pedigree.synthetic import synthetic_big_dict
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__,
+      formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--people", type=int, nargs="+",
+      default=[10000, 30000, 100000])
+  parser.add_argument("--generations", type=int, default=10)
+  parser.add_argument("--sample", type=int, default=2000,
+      help="how many of the youngest people to compute the matrix for")
+  parser.add_argument("--block-size", type=int, default=1000)
+  parser.add_argument("--blocks", type=int, default=5,
+      help="how many blocks to time")
+  args = parser.parse_args()
+
+  print(f"{'people':>8} {'ancestry':>9} {'matrix s':>9} {'s/block':>8}")
+  for num_people in args.people:
+    family = pedigree_lib.dict_to_family(synthetic_big_dict(num_people,
+        generations=args.generations))
+    persons = list(family.persons())
+    sample = persons[-args.sample:]
+    ancestry = sum(len(generation)
+        for generation in family._generations_of_ancestry(sample))
+
+    start = time.perf_counter()
+    family.kinship_matrix(sample)
+    matrix_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    blocks = family.kinship_blocks(persons[::-1], args.block_size)
+    for _ in range(args.blocks):
+      next(blocks)
+    block_time = (time.perf_counter() - start) / args.blocks
+
+    print(f"{num_people:>8} {ancestry:>9} {matrix_time:>9.3f} "
+        f"{block_time:>8.3f}")
+
+
+if __name__ == "__main__":
+  main()
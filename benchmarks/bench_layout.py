@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""
+Time laying out the .svg file in-process with layered_layout against
+piping the .dot file through graphviz's `dot -Tsvg`, and precomputing
+the html page's force_layout, on synthetic families (see
+pedigree.synthetic) of each size.  Graphviz is skipped
+if `dot` isn't on the PATH or once it takes longer than --timeout
+seconds.
+
+    python benchmarks/bench_layout.py
+    python benchmarks/bench_layout.py --people 1000 10000 100000 --timeout 600
+"""
+
+import argparse
+import shutil
+import subprocess
+import tempfile
+import time
+
+from pedigree import pedigree_lib
+from pedigree.synthetic import synthetic_big_dict
+
+
+def layered_seconds(family, sweeps):
+  start = time.perf_counter()
+  with tempfile.TemporaryFile() as svg_file:
+    for line in pedigree_lib.svg_file_generator(family, "both", "full name",
+        sweeps):
+      svg_file.write(line.encode())
+  return time.perf_counter() - start
+
+
+def force_seconds(family):
+  start = time.perf_counter()
+  pedigree_lib.force_layout(family)
+  return time.perf_counter() - start
+
+
+def graphviz_seconds(family, timeout):
+  dot = "\n".join(pedigree_lib.dot_file_generator(family, "both",
+      "full name")).encode()
+  start = time.perf_counter()
+  subprocess.run(["dot", "-Tsvg"], input=dot, stdout=subprocess.DEVNULL,
+      check=True, timeout=timeout)
+  return time.perf_counter() - start
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__,
+      formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--people", type=int, nargs="+",
+      default=[1000, 10000, 100000])
+  parser.add_argument("--sweeps", type=int, default=4)
+  parser.add_argument("--timeout", type=float, default=300,
+      help="seconds to give graphviz before giving up on it")
+  args = parser.parse_args()
+
+  use_graphviz = shutil.which("dot") != None
+  print(f"{'people':>8} {'layered s':>10} {'graphviz s':>11} "
+      f"{'force s':>8}")
+  for num_people in args.people:
+    family = pedigree_lib.dict_to_family(synthetic_big_dict(num_people))
+    layered = layered_seconds(family, args.sweeps)
+    graphviz = "-"
+    if use_graphviz:
+      try:
+        graphviz = f"{graphviz_seconds(family, args.timeout):.3f}"
+      except subprocess.TimeoutExpired:
+        graphviz = f">{args.timeout:.0f}"
+        use_graphviz = False
+    print(f"{num_people:>8} {layered:>10.3f} {graphviz:>11} "
+        f"{force_seconds(family):>8.3f}")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""
+Compare the memory needed to hold many people as individual
+`Person` instances and as one columnar `PersonTable`.  Only people
+held outside a Family are measured; a Family built from a table
+holds full Persons again.
+
+    python benchmarks/bench_person_memory.py
+    python benchmarks/bench_person_memory.py --people 100000
+"""
+
+import argparse
+import gc
+import random
+import tracemalloc
+
+from pedigree import pedigree_lib
+
+
+def synthetic_person_dicts(num_people, seed=0):
+  """
+  Yield toml-style person dicts drawing names from small pools the
+  way real archives repeat names.  Names are rebuilt for every
+  person, as a toml parser would, so interning has work to do.
+  """
+  rng = random.Random(seed)
+  surnames = [f"Surname{i}" for i in range(2000)]
+  given = [f"Given{i}" for i in range(500)]
+  for uid in range(1, num_people + 1):
+    num_given = rng.choice((1, 1, 2, 3))
+    person = {
+      'uid': uid,
+      'surname': "".join(rng.choice(surnames)),
+      'given_names': ["".join(rng.choice(given))
+          for _ in range(num_given)],
+      'gender': "".join(rng.choice("mf")),
+    }
+    if rng.random() < 0.05:
+      person['nickname'] = "".join(rng.choice(given))
+    if rng.random() < 0.02:
+      person['notes'] = ["Some note"]
+    yield person
+
+
+def measure(build, num_people):
+  gc.collect()
+  tracemalloc.start()
+  kept = build(num_people)
+  current, peak = tracemalloc.get_traced_memory()
+  tracemalloc.stop()
+  del kept
+  return current
+
+
+def as_persons(num_people):
+  return [pedigree_lib.Person.from_dict(person)
+      for person in synthetic_person_dicts(num_people)]
+
+
+def as_table(num_people):
+  table = pedigree_lib.PersonTable()
+  for person in synthetic_person_dicts(num_people):
+    table.add(pedigree_lib.Person.from_dict(person))
+  return table
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__,
+      formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--people", type=int, default=1000000,
+      help="number of people to store")
+  args = parser.parse_args()
+
+  print(f"{'representation':>16} {'MiB':>9} {'bytes/person':>13}")
+  for name, build in (("list of Person", as_persons),
+      ("PersonTable", as_table)):
+    used = measure(build, args.people)
+    print(f"{name:>16} {used / 2**20:>9.1f} "
+        f"{used / args.people:>13.1f}")
+
+
+if __name__ == "__main__":
+  main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Time Family.relationship on random pairs, one at a time and as a
+batch through Family.relationships, in a synthetic archive (see
+pedigree.synthetic) of people born in generations.
+
+    python benchmarks/bench_relationships.py
+    python benchmarks/bench_relationships.py --people 200000 --pairs 10000
+"""
+
+import argparse
+import random
+import time
+
+from pedigree import pedigree_lib
+from pedigree.synthetic import synthetic_big_dict
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__,
+      formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--people", type=int, default=200000)
+  parser.add_argument("--generations", type=int, default=10)
+  parser.add_argument("--pairs", type=int, default=2000)
+  args = parser.parse_args()
+
+  family = pedigree_lib.dict_to_family(
+      synthetic_big_dict(args.people, generations=args.generations))
+  rng = random.Random(1)
+  persons = list(family.persons())
+  # Pairs from the last few generations, the interesting ones
+  recent = persons[-5 * (args.people // args.generations):]
+  pairs = [(rng.choice(recent), rng.choice(recent))
+      for _ in range(args.pairs)]
+
+  start = time.perf_counter()
+  one_at_a_time = [family.relationship(a, b) for a, b in pairs]
+  single_time = time.perf_counter() - start
+
+  start = time.perf_counter()
+  batch = list(family.relationships(pairs))
+  batch_time = time.perf_counter() - start
+  assert batch == one_at_a_time
+
+  related = sum(1 for relationship in batch if relationship != None)
+  print(f"{args.people} people, {len(pairs)} pairs, {related} related")
+  print(f"relationship:  {len(pairs) / single_time:10.0f} pairs/s")
+  print(f"relationships: {len(pairs) / batch_time:10.0f} pairs/s")
+
+
+if __name__ == "__main__":
+  main()
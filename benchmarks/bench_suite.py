@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Time loading, every Family accessor, couples(), ==, and the output
+generators on synthetic families (see pedigree.synthetic) of each
+size, writing the seconds each took as JSON so revisions can be
+compared.
+
+    python benchmarks/bench_suite.py --output before.json
+    python benchmarks/bench_suite.py --sizes 1000 10000 --output after.json \\
+        --compare before.json
+"""
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+
+from pedigree import pedigree_lib
+from pedigree.synthetic import write_synthetic_toml
+
+
+def timed(function, *args):
+  start = time.perf_counter()
+  function(*args)
+  return time.perf_counter() - start
+
+
+def per_person(family, accessor):
+  persons = list(family.persons())
+  def run():
+    for person in persons:
+      accessor(person)
+  return run
+
+
+def consume(generator, *args):
+  def run():
+    for _ in generator(*args):
+      pass
+  return run
+
+
+def bench_size(num_people, directory):
+  toml_filename = os.path.join(directory, f"synthetic-{num_people}.toml")
+  write_synthetic_toml(toml_filename, num_people)
+
+  results = {}
+  start = time.perf_counter()
+  family = pedigree_lib.toml_to_family(toml_filename)
+  results["load"] = time.perf_counter() - start
+  results["load, writing cache"] = timed(
+      pedigree_lib.cached_toml_to_family, toml_filename)
+  start = time.perf_counter()
+  same_family = pedigree_lib.cached_toml_to_family(toml_filename)
+  results["load, from cache"] = time.perf_counter() - start
+
+  label = family.labeller("full name")
+  accessors = {
+    "father": per_person(family, family.father),
+    "mother": per_person(family, family.mother),
+    "children": per_person(family, family.children),
+    "all_spouses": per_person(family, family.all_spouses),
+    "uid_to_person": lambda: [family.uid_to_person(uid)
+        for uid in family.uids()],
+    "display_string": per_person(family, label),
+    "fathers": family.fathers,
+    "mothers": family.mothers,
+    "spouses": family.spouses,
+    "generations": family.generations,
+    "couples": family.couples,
+    "==": lambda: family == same_family,
+    "dot_file_generator": consume(pedigree_lib.dot_file_generator, family,
+        "both", "full name"),
+    "d3_html_page_generator": consume(pedigree_lib.d3_html_page_generator,
+        family, "both", "full name"),
+    "canvas_html_page_generator": consume(
+        pedigree_lib.canvas_html_page_generator, family, "both", "full name"),
+  }
+  for name, accessor in accessors.items():
+    results[name] = timed(accessor)
+  return results
+
+
+def revision():
+  try:
+    return subprocess.run(["git", "rev-parse", "--short", "HEAD"],
+        capture_output=True, text=True, check=True).stdout.strip()
+  except (OSError, subprocess.CalledProcessError):
+    return None
+
+
+def print_comparison(old, new):
+  print(f"\n{'people':>8} {'':<24} {'before s':>9} {'after s':>9} "
+      f"{'ratio':>6}")
+  for size, results in new["results"].items():
+    for name, seconds in results.items():
+      before = old["results"].get(size, {}).get(name)
+      if before == None:
+        continue
+      print(f"{size:>8} {name:<24} {before:>9.4f} {seconds:>9.4f} "
+          f"{seconds / before if before else float('inf'):>6.2f}")
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__,
+      formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--sizes", type=int, nargs="+",
+      default=[1000, 10000, 100000, 1000000])
+  parser.add_argument("--output", help="JSON file for the results "
+      "(standard output if not given)")
+  parser.add_argument("--compare", help="JSON file from an earlier run "
+      "to compare against")
+  args = parser.parse_args()
+
+  report = {
+    "revision": revision(),
+    "python": platform.python_version(),
+    "results": {},
+  }
+  with tempfile.TemporaryDirectory() as directory:
+    for num_people in args.sizes:
+      print(f"{num_people} people...", file=sys.stderr)
+      report["results"][str(num_people)] = bench_size(num_people, directory)
+
+  if args.output:
+    with open(args.output, "w") as output_file:
+      json.dump(report, output_file, indent=2)
+  else:
+    json.dump(report, sys.stdout, indent=2)
+    print()
+
+  if args.compare:
+    with open(args.compare) as old_file:
+      print_comparison(json.load(old_file), report)
+
+
+if __name__ == "__main__":
+  main()
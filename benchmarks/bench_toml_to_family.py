@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Time `toml_to_family` on synthetic relation files (see
+pedigree.synthetic) of growing size and show that the time per
+relation stays flat.
+
+    python benchmarks/bench_toml_to_family.py
+    python benchmarks/bench_toml_to_family.py --sizes 1000 10000
+
+Parsing (`toml.load`) and building (`dict_to_family`) are timed
+separately since the pure-Python toml parser dominates.
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+import toml
+
+from pedigree import pedigree_lib
+from pedigree.synthetic import write_synthetic_toml
+
+
+def time_once(num_relations, directory):
+  toml_filename = os.path.join(directory, f"bench_{num_relations}.toml")
+  # Nearly everyone has a father and a mother
+  write_synthetic_toml(toml_filename, max(2, num_relations // 2))
+
+  start = time.perf_counter()
+  big_dict = toml.load(toml_filename)
+  parsed = time.perf_counter()
+  family = pedigree_lib.dict_to_family(big_dict)
+  built = time.perf_counter()
+
+  num_edges = sum(
+      len(family.children(parent))
+      for parent in family.fathers() | family.mothers())
+  return parsed - start, built - parsed, num_edges
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__,
+      formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--sizes", type=int, nargs="+",
+      default=[1000, 10000, 100000, 1000000],
+      help="numbers of relations to time")
+  args = parser.parse_args()
+
+  print(f"{'relations':>10} {'parse s':>9} {'build s':>9} "
+      f"{'build us/rel':>13}")
+  with tempfile.TemporaryDirectory() as directory:
+    for size in args.sizes:
+      parse_time, build_time, num_edges = time_once(size, directory)
+      per_relation = 1e6 * build_time / max(num_edges, 1)
+      print(f"{num_edges:>10} {parse_time:>9.3f} {build_time:>9.3f} "
+          f"{per_relation:>13.2f}")
+
+
+if __name__ == "__main__":
+  main()
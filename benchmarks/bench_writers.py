@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Measure how fast the .dot and .html outputs can be written, in MB/s,
+both the old way (one `write` per generated fragment to a text file)
+and through the chunked binary writers.  The last two columns leave
+generating the fragments out and time only writing them.
+
+    python benchmarks/bench_writers.py
+    python benchmarks/bench_writers.py --people 200000 --chunk-size 262144
+"""
+
+import argparse
+import os
+import tempfile
+import time
+
+from pedigree import pedigree_lib
+from pedigree.synthetic import synthetic_big_dict
+
+
+def per_fragment_dot(family, filename):
+  with open(filename, 'w') as f:
+    for line in pedigree_lib.dot_file_generator(family, "both", "full name"):
+      f.write(line + "\n")
+
+
+def per_fragment_html(family, filename):
+  with open(filename, 'w') as f:
+    for line in pedigree_lib.d3_html_page_generator(family, "both",
+        "full name"):
+      f.write(line)
+
+
+def write_per_fragment(fragments, filename):
+  with open(filename, 'w') as f:
+    for fragment in fragments:
+      f.write(fragment)
+
+
+def write_chunked(fragments, filename, chunk_size):
+  with open(filename, 'wb') as f:
+    with pedigree_lib.ChunkedWriter(f, chunk_size=chunk_size) as writer:
+      writer.writelines(fragments)
+
+
+def chunked(write):
+  def run(family, filename, chunk_size):
+    with open(filename, 'wb') as f:
+      write(family, "both", "full name", f, chunk_size=chunk_size)
+  return run
+
+
+def throughput(run, filename, repeats):
+  best = None
+  for _ in range(repeats):
+    start = time.perf_counter()
+    run(filename)
+    elapsed = time.perf_counter() - start
+    best = elapsed if best == None else min(best, elapsed)
+  return os.path.getsize(filename) / best / 1e6
+
+
+def main():
+  parser = argparse.ArgumentParser(description=__doc__,
+      formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument("--people", type=int, default=100000)
+  parser.add_argument("--chunk-size", type=int,
+      default=pedigree_lib.DEFAULT_CHUNK_SIZE)
+  parser.add_argument("--repeats", type=int, default=3,
+      help="report the best of this many runs")
+  args = parser.parse_args()
+
+  family = pedigree_lib.dict_to_family(synthetic_big_dict(args.people))
+  print(f"{'format':>7} {'per fragment MB/s':>18} {'chunked MB/s':>13}"
+      f" {'writing only: per fragment':>27} {'chunked':>8}")
+  with tempfile.TemporaryDirectory() as directory:
+    filename = os.path.join(directory, "output")
+    for name, old, new, generator in (
+        ("dot", per_fragment_dot, chunked(pedigree_lib.write_dot_file),
+            lambda: (line + "\n" for line in
+                pedigree_lib.dot_file_generator(family, "both",
+                "full name"))),
+        ("html", per_fragment_html,
+            chunked(pedigree_lib.write_d3_html_page),
+            lambda: pedigree_lib.d3_html_page_generator(family, "both",
+                "full name"))):
+      old_rate = throughput(lambda f: old(family, f), filename, args.repeats)
+      new_rate = throughput(lambda f: new(family, f, args.chunk_size),
+          filename, args.repeats)
+      fragments = list(generator())
+      old_write_rate = throughput(
+          lambda f: write_per_fragment(fragments, f), filename, args.repeats)
+      new_write_rate = throughput(
+          lambda f: write_chunked(fragments, f, args.chunk_size),
+          filename, args.repeats)
+      print(f"{name:>7} {old_rate:>18.1f} {new_rate:>13.1f}"
+          f" {old_write_rate:>27.1f} {new_write_rate:>8.1f}")
+
+
+if __name__ == "__main__":
+  main()
@@ -18,7 +18,8 @@ if __name__ == "__main__":
         },
         package_dir={"": "src"},
         zip_safe=False,
-        install_requires=["docopt", "hashids", "networkx", "toml",],
+        install_requires=["docopt", "hashids", "toml",],
+        extras_require={"networkx": ["networkx"], "kinship": ["numpy"]},
         include_package_data=True,
         data_files=[('examples', ['examples/example.toml'])],
         version="1.1.0",
@@ -1,8 +1,9 @@
 #!/usr/bin/env python3
 
-import subprocess
 from docopt import docopt
+import functools
 import os
+import sys
 from pedigree import pedigree_lib
 
 version = '1.1.0'
@@ -20,6 +21,12 @@ then generate output based on it
 Usage:
   pedigree [options] generate
   pedigree [options] cleanup
+  pedigree [options] batch <toml-file>...
+  pedigree [options] watch
+  pedigree [options] explore
+  pedigree [options] serve
+  pedigree [options] relate <uid> <other-uid>
+  pedigree [options] output (html|dot|svg)
   pedigree [options]
   pedigree --help
   pedigree --version
@@ -44,8 +51,57 @@ Options:
                                  names via middle names)
   -p --patriliny                 Only show father-of and spouse-of relations
   -m --matriliny                 Only show father-of and spouse-of relations
+  -j --jobs=<n>                  Number of processes for batch
+                                 [DEFAULT: all CPUs]
+  -t --targets=<targets>         Comma separated list of the outputs to
+                                 generate, at the same time
+                                 [DEFAULT: html,dot,svg]
+  -l --layout=<layout>           What lays out the .svg file: graphviz, or
+                                 layered to do it in-process, which is much
+                                 faster for huge trees and doesn't need
+                                 graphviz installed
+                                 [DEFAULT: graphviz]
+  --html-layout=<layout>         What lays out the .html page: the viewer's
+                                 browser, live, or precomputed here once so
+                                 that big trees open at once and always
+                                 look the same (needs numpy), or canvas to
+                                 draw generations on a canvas, which stays
+                                 usable for hundreds of thousands of people
+                                 [DEFAULT: browser]
+  --no-cache                     Always re-read the .toml file instead of
+                                 using the cached copy of it kept in
+                                 <filename>.pedigree-cache
+  -i --incremental               Only re-render what changed in the .toml
+                                 file since the last incremental generate,
+                                 as remembered in XXX.pedigree-snapshot
+  --root=<uid>                   Only generate for this person and their
+                                 ancestors and descendants
+  --depth=<n>                    How many generations up and down to go
+                                 from the --root person.  All of them if
+                                 not given.
+  --debounce=<seconds>           How long the .toml file must stay unchanged
+                                 after a save before watch regenerates
+                                 [DEFAULT: 0.3]
+  --port=<port>                  Port for serve to listen on
+                                 [DEFAULT: 8000]
   cleanup                        Delete generated files (XXX.svg, etc.)
   generate                       Simply create the .svg, .dot, .html files
+  output                         Write the .html or .dot output to stdout
+                                 instead of a file, e.g. to pipe it into
+                                 graphviz, or the .svg output as laid out
+                                 in-process
+  batch                          generate for every given .toml file (or
+                                 glob pattern like 'trees/*.toml') at
+                                 once, writing XXX.svg, XXX.html, ... next
+                                 to each XXX.toml
+  relate                         say how the people with these uids are
+                                 related by blood
+  watch                          keep generating, incrementally, every
+                                 time the .toml file is saved
+  explore                        write XXX-explorer, a page that loads
+                                 people a few at a time as you open them,
+                                 starting with the --root person
+  serve                          serve XXX-explorer on localhost
 """
 
 def main():
@@ -62,6 +118,55 @@ def main():
   if not args['--patriliny'] and args['--matriliny']:
     liny = "matri"
 
+  if args["--exclude-surnames"] and args["--exclude-middle-names"]:
+    style = "last initial, no middle names"
+  elif args["--exclude-surnames"]:
+    style = "last initial"
+  elif args["--exclude-middle-names"]:
+    style = "no middle names"
+  else:
+    style = "full name"
+
+  targets = [target.strip() for target in args['--targets'].split(",")]
+  unknown = set(targets) - set(pedigree_lib.RENDER_TARGETS)
+  if unknown:
+    print(f"Unknown targets {', '.join(sorted(unknown))}.  Only know "
+        + ", ".join(pedigree_lib.RENDER_TARGETS))
+    exit(1)
+
+  layout = args['--layout']
+  if layout not in pedigree_lib.SVG_LAYOUTS:
+    print(f"Unknown layout {layout}.  Only know "
+        + ", ".join(pedigree_lib.SVG_LAYOUTS))
+    exit(1)
+  html_layout = args['--html-layout']
+  if html_layout not in pedigree_lib.HTML_LAYOUTS:
+    print(f"Unknown html layout {html_layout}.  Only know "
+        + ", ".join(pedigree_lib.HTML_LAYOUTS))
+    exit(1)
+
+  try:
+    root = None if args['--root'] == None else int(args['--root'])
+  except ValueError:
+    print(f"--root must be a uid, not {args['--root']}")
+    exit(1)
+  depth = args['--depth']
+  if depth != None:
+    if root == None:
+      print("--depth only makes sense with --root")
+      exit(1)
+    if not depth.isdecimal():
+      print(f"--depth must be a number of generations, not {depth}")
+      exit(1)
+    depth = int(depth)
+
+  if args['batch']:
+    jobs = None if args['--jobs'] == "all CPUs" else int(args['--jobs'])
+    failures = pedigree_lib.batch_generate_files(args['<toml-file>'], liny,
+        style, use_cache=not args['--no-cache'], targets=targets, jobs=jobs,
+        layout=layout, html_layout=html_layout)
+    exit(1 if failures else 0)
+
   # If toml file doesn't exist or is completely empty, create a blank one
   if not os.path.exists(toml_filename) or os.stat(toml_filename).st_size == 0:
     pedigree_lib.create_example_toml(toml_filename)
@@ -69,17 +174,96 @@ def main():
   if args['cleanup']:
     pedigree_lib.cleanup_files(toml_filename, base_filename)
 
+  elif args['output']:
+    if args['--no-cache']:
+      family = pedigree_lib.toml_to_family(toml_filename)
+    else:
+      family = pedigree_lib.cached_toml_to_family(toml_filename)
+    if root != None:
+      try:
+        family = family.lineage(family.uid_to_person(root), depth)
+      except TypeError as e:
+        print(f"\n\033[91m{e}\033[0m\n")
+        exit(1)
+    pedigree_lib.exit_unless_drawable(family)
+    if args['html']:
+      write = functools.partial(pedigree_lib.write_d3_html_page,
+          html_layout=html_layout)
+    elif args['svg']:
+      write = pedigree_lib.write_svg_file
+    else:
+      write = pedigree_lib.write_dot_file
+    try:
+      write(family, liny, style, sys.stdout.buffer)
+    except BrokenPipeError:
+      # Whatever was reading stdout has stopped; don't let Python
+      # complain about flushing it on the way out
+      os.dup2(os.open(os.devnull, os.O_WRONLY), sys.stdout.fileno())
+
+  elif args['relate']:
+    if args['--no-cache']:
+      family = pedigree_lib.toml_to_family(toml_filename)
+    else:
+      family = pedigree_lib.cached_toml_to_family(toml_filename)
+    label = family.labeller(style)
+    try:
+      a = family.uid_to_person(int(args['<uid>']))
+      b = family.uid_to_person(int(args['<other-uid>']))
+    except (TypeError, ValueError) as e:
+      print(f"\n\033[91m{e}\033[0m\n")
+      exit(1)
+    relationship = family.relationship(a, b)
+    if relationship == None:
+      print(f"{label(a)} and {label(b)} aren't related by blood")
+    elif a == b:
+      print(f"{label(a)} is the same person as {label(b)}")
+    else:
+      print(f"{label(a)} is {label(b)}'s {relationship.name}")
+      if a not in relationship.common_ancestors and \
+          b not in relationship.common_ancestors:
+        print("  through " + " and ".join(label(ancestor)
+            for ancestor in relationship.common_ancestors))
+
   elif args['generate']:
-    if args["--exclude-surnames"] and args["--exclude-middle-names"]:
-      style = "last initial, no middle names"
-    elif args["--exclude-surnames"]:
-      style = "last initial"
-    elif args["--exclude-middle-names"]:
-      style = "no middle names"
+    pedigree_lib.generate_files(toml_filename, base_filename, liny, style,
+        use_cache=not args['--no-cache'], targets=targets,
+        incremental=args['--incremental'], root=root, depth=depth,
+        layout=layout, html_layout=html_layout)
+
+  elif args['explore']:
+    if args['--no-cache']:
+      family = pedigree_lib.toml_to_family(toml_filename)
     else:
-      style = "full name"
+      family = pedigree_lib.cached_toml_to_family(toml_filename)
+    directory = base_filename + pedigree_lib.EXPLORER_SUFFIX
+    try:
+      written = pedigree_lib.write_explorer(family, directory, liny, style,
+          root=root)
+    except TypeError as e:
+      print(f"\n\033[91m{e}\033[0m\n")
+      exit(1)
+    print(f"Wrote {written} changed chunks to {directory}.  "
+        "Browse it with `pedigree serve`.")
+
+  elif args['serve']:
+    directory = base_filename + pedigree_lib.EXPLORER_SUFFIX
+    if not os.path.isdir(directory):
+      print(f"\n\033[91mNo {directory} to serve.  "
+          "Write it with `pedigree explore`.\033[0m\n")
+      exit(1)
+    try:
+      pedigree_lib.serve_explorer(directory, int(args['--port']))
+    except KeyboardInterrupt:
+      print()
 
-    pedigree_lib.generate_files(toml_filename, base_filename, liny, style)
+  elif args['watch']:
+    watcher = pedigree_lib.FamilyWatcher(toml_filename, base_filename, liny,
+        style, targets, debounce=float(args['--debounce']), layout=layout,
+        html_layout=html_layout)
+    try:
+      watcher.run()
+    except KeyboardInterrupt:
+      print()
 
 
 if __name__ == "__main__":
@@ -1,15 +1,17 @@
-import hashids
 import re
-import networkx as nx
-import tempfile
-from urllib.request import pathname2url
-import webbrowser
+import sys
+import bisect
+from array import array
 import os
-import subprocess
 import time
-import logging
-from collections import Iterable
-import toml
+import json
+from collections import namedtuple
+from itertools import islice
+from collections.abc import Iterable
+
+# `pedigree` gets run in tight loops by batch jobs, so anything
+# slow to import (toml, pickle, networkx, subprocess, webbrowser,
+# ...) is imported by the functions that need it instead of here.
 
 """
 Family is kept as a "directed multigraph" with Persons as
@@ -31,28 +33,41 @@ class PersonExistsError(Exception):
   pass
 
 
+def _intern(value):
+  """`sys.intern` anything that's a str and pass everything else through"""
+  if type(value) == str:
+    return sys.intern(value)
+  return value
+
+
 class Person:
   """
   Two Persons are identical if they have identical uids.
 
   `uid` is cast to an integer by the constructor
-  `given_names` should be iterable
+  `given_names` should be iterable and is kept as a tuple
+
+  Persons use `__slots__` and intern their names since an archive
+  can hold millions of them and most names repeat.
   """
+  __slots__ = ("uid", "surname", "given_names", "gender", "nickname",
+      "notes")
+
   def __init__(self, uid, *, surname="", given_names=None, gender="?", nickname=None, notes=None):
     if given_names == None:
-      given_names = ["???"]
+      given_names = ("???",)
     if notes == None:
-      notes = []
-    self.surname = surname
-    self.gender = gender
+      notes = ()
+    self.surname = _intern(surname)
+    self.gender = _intern(gender)
     self.nickname = nickname
-    self.notes = notes
+    self.notes = tuple(notes)
     self.uid = int(uid)
     if not isinstance(given_names, Iterable):
       raise TypeError("Person constructor given non-iterable `given_names`")
     if len(given_names) < 1:
       raise TypeError("Person needs at least one given name.")
-    self.given_names = given_names
+    self.given_names = tuple(_intern(name) for name in given_names)
 
   def from_dict(some_dict):
     try:
@@ -74,19 +89,16 @@ class Person:
   def __ne__(self, other):
     return (self.uid != other.uid)
 
+  def __lt__(self, other):
+    return self.uid < other.uid
+
   def __str__(self):
     return " ".join(self.given_names) + " " + self.surname
 
   def display_string(self, style, with_uid=True):
-    if style == "full name":
-      to_return = " ".join(self.given_names) + f" {self.surname}"
-    elif style == "last initial":
-      to_return = " ".join(self.given_names) + f" {self.surname[0]}."
-    elif style == "last initial, no middle names":
-      to_return = self.given_names[0] + f" {self.surname[0]}."
-    elif style == "no middle names":
-      to_return = self.given_names[0] + f" {self.surname}"
-    else:
+    try:
+      to_return = DISPLAY_STYLES[style](self)
+    except KeyError:
       raise ValueError(f"Unknown style '{style}'")
 
     if with_uid:
@@ -101,6 +113,434 @@ class Person:
     return self.given_names[0]
 
 
+# How `Person.display_string` renders each style, without the uid
+DISPLAY_STYLES = {
+  "full name":
+    lambda person: " ".join(person.given_names) + f" {person.surname}",
+  "last initial":
+    lambda person: " ".join(person.given_names) + f" {person.surname[0]}.",
+  "last initial, no middle names":
+    lambda person: person.given_names[0] + f" {person.surname[0]}.",
+  "no middle names":
+    lambda person: person.given_names[0] + f" {person.surname}",
+}
+
+
+class PersonTable:
+  """
+  Columnar storage for many Persons: one row per person in
+  parallel arrays.  Names are stored once in `names` and referred
+  to by index.  Rarely used columns (nicknames and notes) are only
+  kept for the people that have them.
+
+  Rows are found by bisecting the uid column while uids are added
+  in increasing order, as they are in most archives, and through
+  a uid -> row dict otherwise.
+
+  Iterating over a PersonTable, or looking someone up by uid,
+  builds Person instances on the fly, so a PersonTable can be
+  handed to anything expecting an iterable of Persons, e.g.
+  `Family(persons=table)`.
+
+  The savings only last while people stay in the table.  A Family
+  keeps a full Person for everyone in it, so `Family(persons=table)`
+  uses as much memory as building the Family from Persons directly.
+  """
+  def __init__(self, persons=None):
+    self.names = []
+    self._name_codes = {}
+    self._uids = array('q')
+    self._surnames = array('I')
+    self._given_name_ends = array('I')
+    self._given_names = array('I')
+    self._genders = array('I')
+    self._nicknames = {}
+    self._notes = {}
+    self._row_of_uid = None
+    if persons != None:
+      for person in persons:
+        self.add(person)
+
+  def _code(self, name):
+    code = self._name_codes.get(name)
+    if code == None:
+      code = self._name_codes[name] = len(self.names)
+      self.names.append(name)
+    return code
+
+  def _row(self, uid):
+    if self._row_of_uid != None:
+      return self._row_of_uid.get(uid)
+    row = bisect.bisect_left(self._uids, uid)
+    if row < len(self._uids) and self._uids[row] == uid:
+      return row
+    return None
+
+  def add(self, person):
+    """Store `person` unless someone with its uid is already stored"""
+    if self._row(person.uid) != None:
+      return
+    row = len(self._uids)
+    if self._row_of_uid != None:
+      self._row_of_uid[person.uid] = row
+    elif row > 0 and person.uid < self._uids[-1]:
+      self._row_of_uid = {uid: row for row, uid in enumerate(self._uids)}
+      self._row_of_uid[person.uid] = row
+    self._uids.append(person.uid)
+    self._surnames.append(self._code(person.surname))
+    self._given_names.extend(self._code(name)
+        for name in person.given_names)
+    self._given_name_ends.append(len(self._given_names))
+    self._genders.append(self._code(person.gender))
+    if person.nickname != None:
+      self._nicknames[row] = person.nickname
+    if person.notes:
+      self._notes[row] = person.notes
+
+  def _person_at(self, row):
+    start = self._given_name_ends[row - 1] if row > 0 else 0
+    names = self.names
+    return Person(self._uids[row],
+        surname=names[self._surnames[row]],
+        given_names=[names[code] for code in
+            self._given_names[start:self._given_name_ends[row]]],
+        gender=names[self._genders[row]],
+        nickname=self._nicknames.get(row),
+        notes=self._notes.get(row))
+
+  def uid_to_person(self, uid):
+    row = self._row(uid)
+    if row == None:
+      raise TypeError(f"No person has UID {uid}")
+    return self._person_at(row)
+
+  def uids(self):
+    return list(self._uids)
+
+  def __contains__(self, uid):
+    return self._row(uid) != None
+
+  def __len__(self):
+    return len(self._uids)
+
+  def __iter__(self):
+    for row in range(len(self._uids)):
+      yield self._person_at(row)
+
+
+RELATION_TYPES = ("father", "mother", "spouse")
+
+# Relation types by number, for hashing edges the same way in every
+# process (str hashes are salted per process)
+RELATION_TYPE_CODES = {relation_type: code
+    for code, relation_type in enumerate(RELATION_TYPES)}
+
+
+class CompactGraph:
+  """
+  Family's built-in graph backend.  A directed multigraph whose
+  nodes are numbered in the order they're added, with edges kept
+  per relation_type as arrays of node numbers.
+
+  Every graph backend provides `add_node`, `add_edge`, `has_edge`,
+  `nodes`, `edges`, `successors`, `predecessors`, `sources`, `in`
+  and `len`.
+  """
+  def __init__(self):
+    self._nodes = []
+    self._ids = {}
+    # relation_type -> node number -> array of node numbers
+    self._out = {relation_type: {} for relation_type in RELATION_TYPES}
+    self._in = {relation_type: {} for relation_type in RELATION_TYPES}
+    # `_edge_key` of every edge, for `has_edge`
+    self._edge_keys = set()
+
+  def _edge_key(self, source_id, target_id, relation_type):
+    return (source_id << 34) | (target_id << 2) \
+        | RELATION_TYPE_CODES[relation_type]
+
+  def add_node(self, node):
+    """Does nothing if `node` already present"""
+    if node not in self._ids:
+      self._ids[node] = len(self._nodes)
+      self._nodes.append(node)
+
+  def add_edge(self, source, target, relation_type):
+    if relation_type not in self._out:
+      raise ValueError(f"Unknown relation_type '{relation_type}'")
+    self.add_node(source)
+    self.add_node(target)
+    source_id = self._ids[source]
+    target_id = self._ids[target]
+    out = self._out[relation_type]
+    if source_id not in out:
+      out[source_id] = array('l')
+    out[source_id].append(target_id)
+    into = self._in[relation_type]
+    if target_id not in into:
+      into[target_id] = array('l')
+    into[target_id].append(source_id)
+    self._edge_keys.add(self._edge_key(source_id, target_id, relation_type))
+
+  def has_edge(self, source, target, relation_type):
+    """Whether there's at least one `relation_type` edge `source` -> `target`"""
+    source_id = self._ids.get(source)
+    target_id = self._ids.get(target)
+    if source_id == None or target_id == None:
+      return False
+    return self._edge_key(source_id, target_id, relation_type) \
+        in self._edge_keys
+
+  def nodes(self):
+    """A live, set-like view of the nodes in the order they were added"""
+    return self._ids.keys()
+
+  def edges(self, relation_type=None):
+    """Yield `(source, target, relation_type)` for every edge"""
+    relation_types = RELATION_TYPES if relation_type == None \
+        else (relation_type,)
+    nodes = self._nodes
+    for cur_type in relation_types:
+      for source_id, target_ids in self._out[cur_type].items():
+        for target_id in target_ids:
+          yield nodes[source_id], nodes[target_id], cur_type
+
+  def _neighbors(self, adjacency, node):
+    node_id = self._ids.get(node)
+    if node_id == None or node_id not in adjacency:
+      return []
+    nodes = self._nodes
+    return [nodes[neighbor_id] for neighbor_id in adjacency[node_id]]
+
+  def successors(self, node, relation_type):
+    """Targets of `node`'s `relation_type` edges, one per edge"""
+    return self._neighbors(self._out[relation_type], node)
+
+  def predecessors(self, node, relation_type):
+    """Sources of `relation_type` edges into `node`, one per edge"""
+    return self._neighbors(self._in[relation_type], node)
+
+  def sources(self, relation_type):
+    """Nodes with at least one outgoing `relation_type` edge"""
+    nodes = self._nodes
+    return [nodes[node_id] for node_id in self._out[relation_type]]
+
+  def __contains__(self, node):
+    return node in self._ids
+
+  def __len__(self):
+    return len(self._nodes)
+
+
+class NetworkxGraph:
+  """
+  Graph backend keeping everything in a networkx MultiDiGraph,
+  available as `nx_graph`, with a relation_type attribute on every
+  edge.  networkx is only needed if this backend is used.
+  """
+  def __init__(self):
+    import networkx as nx
+    self.nx_graph = nx.MultiDiGraph()
+    # relation_type -> nodes with an outgoing edge of that type,
+    # in a dict used as an insertion-ordered set
+    self._sources = {relation_type: {} for relation_type in RELATION_TYPES}
+
+  def add_node(self, node):
+    """Does nothing if `node` already present"""
+    self.nx_graph.add_node(node)
+
+  def add_edge(self, source, target, relation_type):
+    if relation_type not in self._sources:
+      raise ValueError(f"Unknown relation_type '{relation_type}'")
+    self.nx_graph.add_edge(source, target, relation_type=relation_type)
+    self._sources[relation_type][source] = None
+
+  def has_edge(self, source, target, relation_type):
+    edges = self.nx_graph.get_edge_data(source, target) or {}
+    return any(data['relation_type'] == relation_type
+        for data in edges.values())
+
+  def nodes(self):
+    return self.nx_graph.nodes()
+
+  def edges(self, relation_type=None):
+    for source, target, data in self.nx_graph.edges(data=True):
+      if relation_type == None or data['relation_type'] == relation_type:
+        yield source, target, data['relation_type']
+
+  def _neighbors(self, adjacency, node, relation_type):
+    if node not in adjacency:
+      return []
+    return [
+      neighbor
+      for neighbor, edges in adjacency[node].items()
+      for data in edges.values()
+      if data['relation_type'] == relation_type
+    ]
+
+  def successors(self, node, relation_type):
+    return self._neighbors(self.nx_graph.succ, node, relation_type)
+
+  def predecessors(self, node, relation_type):
+    return self._neighbors(self.nx_graph.pred, node, relation_type)
+
+  def sources(self, relation_type):
+    return list(self._sources[relation_type])
+
+  def __contains__(self, node):
+    return node in self.nx_graph
+
+  def __len__(self):
+    return len(self.nx_graph)
+
+
+# Family's fingerprint hash sums wrap around at 64 bits
+_HASH_MASK = 2**64 - 1
+
+GRAPH_BACKENDS = {
+  "compact": CompactGraph,
+  "networkx": NetworkxGraph,
+}
+
+
+def _parents_and_children_among(persons_by_uid, parents_of):
+  """
+  Return dicts uid -> uids of each person's distinct parents, and
+  of their distinct children, among `persons_by_uid`
+  """
+  parents = {}
+  children = {uid: [] for uid in persons_by_uid}
+  for uid, person in persons_by_uid.items():
+    parents[uid] = list({parent.uid: None for parent in parents_of(person)
+        if parent.uid in persons_by_uid})
+    for parent_uid in parents[uid]:
+      children[parent_uid].append(uid)
+  return parents, children
+
+
+def _kahn_layers(persons_by_uid, parents, children):
+  """
+  Split the people in `persons_by_uid` into layers with Kahn's
+  algorithm: first those without `parents` (a dict uid -> uids),
+  then those whose parents are all in earlier layers, and so on.
+  `children` must be the inverse of `parents`.  Raises
+  GenealogicalError if someone is their own ancestor, since then
+  they can never be placed.
+  """
+  parents_left = {uid: len(parent_uids)
+      for uid, parent_uids in parents.items()}
+  layer = [uid for uid, left in parents_left.items() if left == 0]
+  layers = []
+  placed = 0
+  while layer:
+    layers.append([persons_by_uid[uid] for uid in layer])
+    placed += len(layer)
+    previous_layer, layer = layer, []
+    for parent_uid in previous_layer:
+      for child_uid in children[parent_uid]:
+        parents_left[child_uid] -= 1
+        if parents_left[child_uid] == 0:
+          layer.append(child_uid)
+  if placed != len(persons_by_uid):
+    stuck = sorted(uid for uid, left in parents_left.items() if left > 0)
+    raise GenealogicalError("Someone is their own ancestor among UIDs "
+        + ", ".join(str(uid) for uid in stuck))
+  return layers
+
+
+def _generation_layers(persons_by_uid, parents_of, spouses_of):
+  """
+  `persons_by_uid` by generation.  Parents are always in earlier
+  generations than their children and as late as that allows, so
+  people marrying in line up with their spouses rather than with the
+  oldest ancestors.  People without children are in the generation
+  after their parents' or, without parents either, their spouse's.
+  """
+  parents, children = _parents_and_children_among(persons_by_uid,
+      parents_of)
+
+  # Kahn's algorithm from the youngest, then turned upside down
+  layers = _kahn_layers(persons_by_uid, children, parents)
+  generation_of_uid = {person.uid: len(layers) - 1 - height
+      for height, layer in enumerate(layers) for person in layer}
+
+  childless = [uid for uid, child_uids in children.items() if not child_uids]
+  for uid in childless:
+    if parents[uid]:
+      generation_of_uid[uid] = 1 + max(generation_of_uid[parent_uid]
+          for parent_uid in parents[uid])
+  for uid in childless:
+    if not parents[uid]:
+      spouses = [spouse for spouse in spouses_of(persons_by_uid[uid])
+          if spouse.uid in persons_by_uid]
+      if spouses:
+        generation_of_uid[uid] = generation_of_uid[spouses[0].uid]
+
+  by_generation = {}
+  for uid, person in persons_by_uid.items():
+    by_generation.setdefault(generation_of_uid[uid], []).append(person)
+  return [by_generation[generation] for generation in sorted(by_generation)]
+
+
+# What `Family.relationship(a, b)` finds: `name` is what `a` is to
+# `b`, through the nearest `common_ancestors`, who are
+# `generations_up_from_a` and `generations_up_from_b` generations up
+Relationship = namedtuple("Relationship", ["name", "common_ancestors",
+    "generations_up_from_a", "generations_up_from_b"])
+
+_ORDINALS = ["zeroth", "first", "second", "third", "fourth", "fifth",
+    "sixth", "seventh", "eighth", "ninth", "tenth"]
+_TIMES = ["never", "once", "twice"]
+
+def relationship_name(up_from_a, up_from_b, gender=None):
+  """
+  What someone is to another person when their nearest common
+  ancestor is `up_from_a` generations above them and `up_from_b`
+  above the other person.  `gender` is the first person's.
+
+      >>> relationship_name(0, 2, "f")
+      'grandmother'
+      >>> relationship_name(1, 3, "m")
+      'great-uncle'
+      >>> relationship_name(3, 2)
+      'first cousin once removed'
+  """
+  def gendered(male, female, neither):
+    if gender in ("m", "male"):
+      return male
+    if gender in ("f", "female"):
+      return female
+    return neither
+
+  def greats(generations):
+    return "great-" * (generations - 1)
+
+  if up_from_a == 0 and up_from_b == 0:
+    return "self"
+  if up_from_a == 0:
+    return greats(up_from_b - 1) + ("grand" if up_from_b > 1 else "") + \
+        gendered("father", "mother", "parent")
+  if up_from_b == 0:
+    return greats(up_from_a - 1) + ("grand" if up_from_a > 1 else "") + \
+        gendered("son", "daughter", "child")
+  if up_from_a == 1 and up_from_b == 1:
+    return gendered("brother", "sister", "sibling")
+  if up_from_a == 1:
+    return greats(up_from_b - 1) + gendered("uncle", "aunt", "aunt or uncle")
+  if up_from_b == 1:
+    return greats(up_from_a - 1) + \
+        gendered("nephew", "niece", "niece or nephew")
+
+  degree = min(up_from_a, up_from_b) - 1
+  removed = abs(up_from_a - up_from_b)
+  name = (_ORDINALS[degree] if degree < len(_ORDINALS) else f"{degree}th") \
+      + " cousin"
+  if removed:
+    name += " " + (_TIMES[removed] if removed < len(_TIMES)
+        else f"{removed} times") + " removed"
+  return name
+
+
 class Family:
   """
   Family is kept as a "directed multigraph" with Persons as
@@ -110,15 +550,30 @@ class Family:
 
   Represent a family as a collection of Persons each with a
   unique .name property and connections between them.
+
+  `backend` names the graph implementation from GRAPH_BACKENDS.
   """
-  def __init__(self, persons=None):
+  def __init__(self, persons=None, backend="compact"):
     # Full directed multipgraph of Persons with mother, father,
     # and spouse as all the relation_type's.
-    self.graph = nx.MultiDiGraph()
-    if persons == None:
-      self.graph.add_nodes_from([])
-    else:
-      self.graph.add_nodes_from(persons)
+    try:
+      self.graph = GRAPH_BACKENDS[backend]()
+    except KeyError:
+      raise ValueError(f"Unknown graph backend '{backend}'.  Only know "
+          + ", ".join(GRAPH_BACKENDS))
+
+    # Every Person in `graph`, keyed by uid
+    self._persons_by_uid = {}
+
+    # Order-independent fingerprint of the people and relations,
+    # kept up to date as they're added: the sum of a hash of each
+    # uid and of each distinct `(relation type code, uid, uid)` edge
+    self._edge_count = 0
+    self._hash_sum = 0
+
+    if persons != None:
+      for person in persons:
+        self.add_person(person)
 
     # Interesting data about individuals is kept in the
     # `notes` dict, keyed by Persons.  May add pairs
@@ -126,55 +581,95 @@ class Family:
     # edges.
     self.notes = {}
 
+    # style -> uid -> (given_names, surname, display string) for
+    # `display_string`.  Keyed by uid since hashing a Person means
+    # a call to Person.__hash__.
+    self._labels = {}
+
+    # `generations()`, until someone or some relation is added
+    self._generations = None
+
   def __eq__(self, other):
-    # Two families are the same if they have the same lists of
-    # fathers, mothers, spouses, and same relations between them.
-    our_persons = self.persons()
-    their_persons = other.persons()
-    our_mothers = self.mothers()
-    their_mothers = other.mothers()
-    our_fathers = self.fathers()
-    their_fathers = other.fathers()
-    our_spouses = self.spouses()
-    their_spouses = other.spouses()
-    if sorted(our_persons) != sorted(their_persons):
-      return False
-    if sorted(our_mothers) != sorted(their_mothers):
+    # Two families are the same if they have the same people and
+    # the same relations between them, however many times and in
+    # whatever order they were added.  Fingerprints tell almost all
+    # different families apart without looking at either.
+    if not isinstance(other, Family):
+      return NotImplemented
+    if self.fingerprint() != other.fingerprint():
       return False
-    if sorted(our_fathers) != sorted(their_fathers):
+    if self._persons_by_uid.keys() != other._persons_by_uid.keys():
       return False
-    if sorted(our_spouses) != sorted(their_spouses):
-      return False
-    for father in our_fathers:
-      if sorted(self.children(father)) != \
-          sorted(other.children(father)):
-        return False
-    for mother in our_mothers:
-      if sorted(self.children(mother)) != \
-          sorted(other.children(mother)):
-        return False
-    for spouse in our_spouses:
-      if sorted(self.all_spouses(spouse)) != \
-          sorted(other.all_spouses(spouse)):
-        return False
+    return self._relations() == other._relations()
+
+  def fingerprint(self):
+    """
+    `(number of people, number of distinct relations, hash)`, the
+    same for equal families however they were built.  Costs nothing
+    to get since it's updated as people and relations are added.
+    """
+    return (len(self._persons_by_uid), self._edge_count,
+        self._hash_sum)
 
-    return True
+  def _relations(self):
+    """Set of every `(relation_type, uid, uid)` relation"""
+    return {(relation_type, source.uid, target.uid)
+        for source, target, relation_type in self.graph.edges()}
 
   def __ne__(self, other):
     return not (self == other)
 
   def add_person(self, person):
+    # Does nothing if `person` already present
     self.graph.add_node(person)
+    if person.uid not in self._persons_by_uid:
+      self._persons_by_uid[person.uid] = person
+      self._generations = None
+      self._hash_sum = (self._hash_sum + hash((person.uid,))) & _HASH_MASK
 
   def persons(self):
     return self.graph.nodes()
 
   def uids(self):
-    return [person.uid for person in self.persons()]
+    return list(self._persons_by_uid)
+
+  def has_uid(self, uid):
+    return uid in self._persons_by_uid
 
   def names(self):
     return [str(person) for person in self.persons()]
 
+  def display_string(self, person, style):
+    """
+    `person.display_string(style)`, only rendered again once the
+    person's names change.
+    """
+    return self.labeller(style)(person)
+
+  def labeller(self, style):
+    """
+    Return a function giving `person.display_string(style)` for
+    any `person`, rendering each person once per style and again
+    only once their names change.  Both output generators use these
+    so that a person appearing many times is rendered once.
+    """
+    labels = self._labels.get(style)
+    if labels == None:
+      if style not in DISPLAY_STYLES:
+        raise ValueError(f"Unknown style '{style}'")
+      labels = self._labels[style] = {}
+
+    def label(person):
+      cached = labels.get(person.uid)
+      if cached != None and cached[0] is person.given_names and \
+          cached[1] is person.surname:
+        return cached[2]
+      rendered = person.display_string(style)
+      labels[person.uid] = (person.given_names, person.surname, rendered)
+      return rendered
+
+    return label
+
   def name_to_person(self, name):
     for person in self.persons():
       if person.name == name:
@@ -182,13 +677,22 @@ class Family:
     return None
 
   def uid_to_person(self, uid):
-    for person in self.persons():
-      if person.uid == uid:
-        return person
-    raise TypeError(f"No person has UID {uid}")
+    try:
+      return self._persons_by_uid[uid]
+    except KeyError:
+      raise TypeError(f"No person has UID {uid}")
 
   def change_name(self, person, new_name):
-    person.name = new_name
+    """
+    `new_name` is read the way `str(person)` writes it: given names
+    followed by the surname.  Raises ValueError if it's blank.
+    """
+    if not new_name.split():
+      raise ValueError(f"Can't rename {person} to a blank name")
+    *given_names, surname = new_name.split()
+    person.given_names = tuple(_intern(name)
+        for name in given_names or [surname])
+    person.surname = _intern(surname if given_names else "")
 
   def add_note(self, person, new_note):
     if person not in self.notes:
@@ -201,43 +705,61 @@ class Family:
       if to_be_deleted in self.notes[person]:
         self.notes[person].remove(to_be_deleted)
 
-  def add_child(self, parent, child):
-
-    # Does nothing if `parent` already present
-    self.graph.add_node(parent)
-
-    relation_type = None
+  def _add_edge(self, source, target, relation_type):
+    """
+    Add an edge to the graph, indexing any new Persons.  All edges
+    should be added through here.
+    """
+    self.add_person(source)
+    self.add_person(target)
+    # A repeated relation is still added to the graph, but isn't
+    # counted again in the fingerprint
+    is_new = not self.graph.has_edge(source, target, relation_type)
+    self.graph.add_edge(source, target, relation_type)
+    self._generations = None
+    if is_new:
+      self._edge_count += 1
+      self._hash_sum = (self._hash_sum + hash((
+          RELATION_TYPE_CODES[relation_type], source.uid, target.uid))) \
+          & _HASH_MASK
+
+  def _parent_relation_type(self, parent):
     if parent.gender == "m":
-      relation_type = "father"
+      return "father"
     elif parent.gender == "f":
-      relation_type = "mother"
+      return "mother"
     else:
       raise GenderError("Without a gender on {}, can't tell"
           " whether she should be added "
           "as a mother or father.".format(parent))
 
-    self.graph.add_edge(parent, child,
-        relation_type=relation_type)
+  def add_child(self, parent, child):
+    self.add_children(parent, [child])
 
   def add_children(self, parent, children):
+
+    # Does nothing if `parent` already present
+    self.add_person(parent)
+
+    relation_type = self._parent_relation_type(parent)
     for child in children:
-      self.add_child(parent, child)
+      self._add_edge(parent, child, relation_type)
 
   def add_spouse(self, person, spouse):
-    # Does nothing if `parent` already present
-    self.graph.add_node(person)
-    self.graph.add_edge(person, spouse, relation_type="spouse")
+    self.add_spouses(person, [spouse])
 
   def add_spouses(self, person, spouses):
+    # Does nothing if `person` already present
+    self.add_person(person)
     for spouse in spouses:
-      self.add_spouse(person, spouse)
+      self._add_edge(person, spouse, "spouse")
 
   def add_full_sibling(self, person, sibling):
-    if person not in self.persons():
+    if person not in self.graph:
       raise PersonExistsError(
           "{} isn't in the family yet.".format(person))
     # Does nothing if `sibling` already present
-    self.graph.add_node(sibling)
+    self.add_person(sibling)
 
     # Add either parent if they don't exist
     if not self.father(person):
@@ -247,10 +769,8 @@ class Family:
       self.add_mother(person,
           Person(name=self.new_anonymous_name(), gender="female"))
 
-    self.graph.add_edge(self.father(person), sibling,
-        relation_type="father")
-    self.graph.add_edge(self.mother(person), sibling,
-        relation_type="mother")
+    self._add_edge(self.father(person), sibling, "father")
+    self._add_edge(self.mother(person), sibling, "mother")
 
 
   def new_anonymous_name(self):
@@ -263,7 +783,7 @@ class Family:
       len(anon)
       for anon
       in self.names()
-      if re.match('^\?+$', anon)
+      if re.match(r'^\?+$', anon)
     ]
     if anon_lengths == []:
       longest = 0
@@ -289,18 +809,9 @@ class Family:
       raise GenderError("{0} isn't female, so can't " \
           "be a mother.".format(mother))
 
-    # If already a mother of someone else, add to children
-    # list
-    mom_found = False
-    for cur_mom in self.mothers():
-      if cur_mom == mother:
-        mom_found = True
-        if child not in self.children(cur_mom):
-          self.add_child(cur_mom, child)
-
-    # Otherwise, add the mother and add the child
-    if not mom_found:
-      self.add_person(mother)
+    # Add the mother if she's new and the child if it's new to her
+    self.add_person(mother)
+    if not self._is_child(mother, child):
       self.add_child(mother, child)
 
   def add_father(self, child, father):
@@ -321,94 +832,370 @@ class Family:
       raise GenderError("{0} isn't male, so can't " \
           "be a father.".format(father))
 
-    # If already a father of someone else, add to children
-    # list
-    dad_found = False
-    for cur_dad in self.fathers():
-      if cur_dad == father:
-        dad_found = True
-        if child not in self.children(cur_dad):
-          self.add_child(cur_dad, child)
-
-    # Otherwise, add the father and add the child
-    if not dad_found:
-      self.add_person(father)
+    # Add the father if he's new and the child if it's new to him
+    self.add_person(father)
+    if not self._is_child(father, child):
       self.add_child(father, child)
 
 
+  def _is_child(self, parent, child):
+    return self.graph.has_edge(parent, child, "father") \
+        or self.graph.has_edge(parent, child, "mother")
+
   def children(self, parent):
-    if parent not in self.persons():
+    if parent not in self.graph:
       raise PersonExistsError(
           "{} isn't in the family yet.".format(parent))
 
-    return set([
-      edge[1]
-      for edge in self.graph.edges(data=True)
-      if (edge[2]['relation_type'] == "father" or \
-          edge[2]['relation_type'] == "mother") and \
-         edge[0] == parent
-    ])
+    return set(self.graph.successors(parent, "father")) | \
+        set(self.graph.successors(parent, "mother"))
 
   def fathers(self):
-    return set([
-        edge[0]
-        for edge in self.graph.edges(data=True)
-        if edge[2]['relation_type'] == "father"
-    ])
+    return set(self.graph.sources("father"))
   def mothers(self):
-    return set([
-        edge[0]
-        for edge in self.graph.edges(data=True)
-        if edge[2]['relation_type'] == "mother"
-    ])
+    return set(self.graph.sources("mother"))
   def spouses(self):
-    return set([
-        edge[0]
-        for edge in self.graph.edges(data=True)
-        if edge[2]['relation_type'] == "spouse"
-    ])
+    return set(self.graph.sources("spouse"))
 
-  def couples(self):
+  def couples(self, lazily=False):
     """
     Return pairs `sorted([one, two])` for any pairs of people
     `one` and `two` who share at least one child *or* are
-    spouses
+    spouses, each pair once.  With `lazily`, return a generator
+    yielding the pairs as they're found instead of a list.
     """
-    to_return = []
-    for father in self.fathers():
-      for child in self.children(father):
-        mother = self.mother(child)
-        if mother:
-          if sorted([father, mother]) not in to_return:
-            to_return.append(sorted([father, mother]))
-    for super_spouse in self.spouses():
-      for sub_spouse in self.all_spouses(super_spouse):
-        if sorted([super_spouse, sub_spouse]) not in to_return:
-          to_return.append(sorted([super_spouse, sub_spouse]))
-    return to_return
+    couples = self._couples()
+    return couples if lazily else list(couples)
+
+  def _couples(self):
+    # Every child's father with its mother, then every spouse pair,
+    # in one pass over each index
+    seen = set()
+    for relation_type in ("father", "spouse"):
+      for one, other, _ in self.graph.edges(relation_type):
+        if relation_type == "father":
+          other = self.mother(other)
+          if not other:
+            continue
+        pair = sorted([one, other])
+        key = (pair[0].uid, pair[1].uid)
+        if key not in seen:
+          seen.add(key)
+          yield pair
 
   def father(self, person):
-    for edge in self.graph.edges(data=True):
-      if edge[2]['relation_type'] == "father" and \
-          edge[1] == person:
-        return edge[0]
-    return None
+    fathers = self.graph.predecessors(person, "father")
+    return fathers[0] if fathers else None
   def mother(self, person):
-    for edge in self.graph.edges(data=True):
-      if edge[2]['relation_type'] == "mother" and \
-          edge[1] == person:
-        return edge[0]
-    return None
+    mothers = self.graph.predecessors(person, "mother")
+    return mothers[0] if mothers else None
   def all_spouses(self, person):
-    cur_spouses = []
-    for edge in self.graph.edges(data=True):
-      if edge[2]['relation_type'] == "spouse" and \
-        edge[0] == person:
-          cur_spouses.append(edge[1])
-    return cur_spouses
+    return self.graph.successors(person, "spouse")
   def persons(self):
     return self.graph.nodes()
 
+  def _parents(self, person):
+    return self.graph.predecessors(person, "father") + \
+        self.graph.predecessors(person, "mother")
+
+  def _children_list(self, person):
+    return self.graph.successors(person, "father") + \
+        self.graph.successors(person, "mother")
+
+  def _breadth_first(self, person, max_depth, next_generation):
+    """
+    Everyone reached from `person` by following `next_generation`
+    at most `max_depth` times (without limit if None), nearest
+    generation first, without `person`
+    """
+    if person not in self.graph:
+      raise PersonExistsError(
+          "{} isn't in the family yet.".format(person))
+    seen = {person.uid}
+    found = []
+    generation = [person]
+    depth = 0
+    while generation and (max_depth == None or depth < max_depth):
+      depth += 1
+      previous_generation, generation = generation, []
+      for current in previous_generation:
+        for relative in next_generation(current):
+          if relative.uid not in seen:
+            seen.add(relative.uid)
+            found.append(relative)
+            generation.append(relative)
+    return found
+
+  def ancestors(self, person, max_depth=None):
+    """
+    Parents, grandparents, ... of `person` going back at most
+    `max_depth` generations, nearest first
+    """
+    return self._breadth_first(person, max_depth, self._parents)
+
+  def descendants(self, person, max_depth=None):
+    """
+    Children, grandchildren, ... of `person` going down at most
+    `max_depth` generations, nearest first
+    """
+    return self._breadth_first(person, max_depth, self._children_list)
+
+  def _ancestor_depths(self, person):
+    """uid -> generations up from `person` for them and all their ancestors"""
+    depths = {person.uid: 0}
+    generation = [person]
+    while generation:
+      previous_generation, generation = generation, []
+      for current in previous_generation:
+        for parent in self._parents(current):
+          if parent.uid not in depths:
+            depths[parent.uid] = depths[current.uid] + 1
+            generation.append(parent)
+    return depths
+
+  def _nearest_relationship(self, a, meetings):
+    """
+    The Relationship of `a` to someone through the nearest of
+    `meetings`, common ancestors' uids -> generations up from each
+    """
+    if not meetings:
+      return None
+    nearest = min(meetings.values(),
+        key=lambda up: (up[0] + up[1], max(up), up[0]))
+    return Relationship(relationship_name(*nearest, a.gender),
+        sorted(self.uid_to_person(uid) for uid, up in meetings.items()
+            if up == nearest),
+        *nearest)
+
+  def relationship(self, a, b):
+    """
+    How `a` is related to `b` by blood, as a Relationship naming what
+    `a` is to `b` ("grandmother", "second cousin once removed", ...),
+    or None if they have no common ancestor.
+
+    Searches up from both at once, always from the side with fewer
+    people to look at next, and stops as soon as no nearer common
+    ancestor can turn up.
+    """
+    for person in (a, b):
+      if person not in self.graph:
+        raise PersonExistsError(
+            "{} isn't in the family yet.".format(person))
+
+    depths = [{a.uid: 0}, {b.uid: 0}]
+    generations = [[a], [b]]
+    levels = [0, 0]
+    meetings = {a.uid: (0, 0)} if a.uid == b.uid else {}
+    nearest = 0 if meetings else None
+
+    def done(side):
+      return not generations[side] or \
+          (nearest != None and levels[side] >= nearest)
+
+    while not (done(0) and done(1)):
+      if done(1) or (not done(0) and
+          len(generations[0]) <= len(generations[1])):
+        side = 0
+      else:
+        side = 1
+      ours, theirs = depths[side], depths[1 - side]
+      levels[side] += 1
+      previous_generation, generations[side] = generations[side], []
+      for current in previous_generation:
+        for parent in self._parents(current):
+          if parent.uid in ours:
+            continue
+          ours[parent.uid] = levels[side]
+          generations[side].append(parent)
+          if parent.uid in theirs:
+            up = (levels[side], theirs[parent.uid])
+            meetings[parent.uid] = up if side == 0 else up[::-1]
+            if nearest == None or sum(up) < nearest:
+              nearest = sum(up)
+
+    return self._nearest_relationship(a, meetings)
+
+  def relationships(self, pairs):
+    """
+    Yield `relationship(a, b)` for every `(a, b)` in `pairs`,
+    remembering everyone's ancestors along the way so that people in
+    many pairs are only searched up from once
+    """
+    ancestor_depths = {}
+    def depths_of(person):
+      depths = ancestor_depths.get(person.uid)
+      if depths == None:
+        if person not in self.graph:
+          raise PersonExistsError(
+              "{} isn't in the family yet.".format(person))
+        depths = ancestor_depths[person.uid] = self._ancestor_depths(person)
+      return depths
+
+    for a, b in pairs:
+      depths_a, depths_b = depths_of(a), depths_of(b)
+      if len(depths_a) <= len(depths_b):
+        meetings = {uid: (up, depths_b[uid])
+            for uid, up in depths_a.items() if uid in depths_b}
+      else:
+        meetings = {uid: (depths_a[uid], up)
+            for uid, up in depths_b.items() if uid in depths_a}
+      yield self._nearest_relationship(a, meetings)
+
+  def generations(self):
+    """
+    Everyone in lists by generation, oldest first, parents always
+    before their children.  Worked out in one pass once, until
+    someone or some relation is added.  Raises GenealogicalError if
+    someone is their own ancestor.
+    """
+    if self._generations == None:
+      self._generations = _generation_layers(self._persons_by_uid,
+          self._parents, self._all_spouses_either_way)
+    return self._generations
+
+  def _all_spouses_either_way(self, person):
+    return self.graph.successors(person, "spouse") + \
+        self.graph.predecessors(person, "spouse")
+
+  def _generations_of_ancestry(self, persons):
+    """
+    `persons` and all their ancestors in generations, parents always
+    in earlier generations than their children, and everyone in the
+    latest generation they can be in: the one just before their
+    first child's (or the last, for `persons` without children
+    among them)
+    """
+    # Everyone involved, through a breadth first search up
+    closure = {person.uid: person for person in persons}
+    generation = list(closure.values())
+    while generation:
+      previous_generation, generation = generation, []
+      for current in previous_generation:
+        for parent in self._parents(current):
+          if parent.uid not in closure:
+            closure[parent.uid] = parent
+            generation.append(parent)
+
+    # Then Kahn's algorithm from the youngest
+    parents, children = _parents_and_children_among(closure, self._parents)
+    return _kahn_layers(closure, children, parents)[::-1]
+
+  def _kinship_of_ancestry(self, persons):
+    """
+    Return `(index of each uid, kinship matrix)` for `persons`, by
+    the tabular method over them and their ancestors: everyone's
+    kinship with everyone earlier is the mean of their parents'
+    kinship with them, so a whole generation's rows are filled in
+    at once.  Ancestors are dropped from the matrix as soon as
+    their last child is in, so it only ever holds a few generations
+    rather than the whole ancestry.
+    """
+    import numpy
+
+    wanted = {person.uid for person in persons}
+    generations = self._generations_of_ancestry(persons)
+    children_left = {}
+    for generation in generations:
+      for person in generation:
+        for parent_uid in {parent.uid for parent in self._parents(person)}:
+          children_left[parent_uid] = children_left.get(parent_uid, 0) + 1
+
+    # Who each row and column is.  Unknown parents are the row and
+    # column of zeros after everyone.
+    uids = []
+    kinship = numpy.zeros((1, 1))
+    for generation in generations:
+      start, end = len(uids), len(uids) + len(generation)
+      index_of_uid = {uid: index for index, uid in enumerate(uids)}
+      def indices(parents):
+        return numpy.array([index_of_uid[parent.uid] if parent else end
+            for parent in parents], dtype=numpy.intp)
+      fathers = indices(map(self.father, generation))
+      mothers = indices(map(self.mother, generation))
+
+      grown = numpy.zeros((end + 1, end + 1))
+      grown[:start, :start] = kinship[:start, :start]
+      kinship = grown
+      # With everyone earlier
+      kinship[start:end, :start] = 0.5 * (kinship[fathers, :start]
+          + kinship[mothers, :start])
+      kinship[:start, start:end] = kinship[start:end, :start].T
+      # With each other, through each other's parents, who are earlier
+      kinship[start:end, start:end] = 0.5 * (
+          kinship[start:end, fathers] + kinship[start:end, mothers])
+      # With themselves
+      kinship[range(start, end), range(start, end)] = 0.5 * (1
+          + kinship[fathers, mothers])
+      uids.extend(person.uid for person in generation)
+
+      # Forget whoever isn't wanted and has no children to come
+      for person in generation:
+        for parent_uid in {parent.uid for parent in self._parents(person)}:
+          children_left[parent_uid] -= 1
+      keep = [index for index, uid in enumerate(uids)
+          if uid in wanted or children_left.get(uid, 0) > 0]
+      if len(keep) < len(uids):
+        uids = [uids[index] for index in keep]
+        keep.append(end)
+        kinship = kinship[numpy.ix_(keep, keep)]
+
+    return {uid: index for index, uid in enumerate(uids)}, \
+        kinship[:len(uids), :len(uids)]
+
+  def kinship_matrix(self, persons=None):
+    """
+    The numpy array of kinship coefficients between every two of
+    `persons` (everyone by default), in that order: the chance that
+    a gene picked from each is inherited from the same ancestor.
+    Twice the kinship is the coefficient of relationship, and
+    someone's inbreeding coefficient is `2 * kinship[i, i] - 1`.
+
+    Memory is quadratic in the number of `persons` plus however many
+    ancestors are still needed for a generation to come.  See
+    `kinship_blocks` for large populations.
+    """
+    import numpy
+
+    persons = list(self.persons() if persons == None else persons)
+    index_of_uid, kinship = self._kinship_of_ancestry(persons)
+    rows = numpy.array([index_of_uid[person.uid] for person in persons],
+        dtype=numpy.intp)
+    return kinship[numpy.ix_(rows, rows)]
+
+  def kinship_blocks(self, persons=None, block_size=1000):
+    """
+    Yield the `kinship_matrix(persons)` a block at a time, as
+    `(first row, first column, block)` for every block on or above
+    the diagonal (those below are their transposes).  Each block
+    only involves the ancestors of its own rows and columns, so
+    memory is bounded by those rather than by the whole population.
+    """
+    persons = list(self.persons() if persons == None else persons)
+    for row_start in range(0, len(persons), block_size):
+      row_persons = persons[row_start:row_start + block_size]
+      yield row_start, row_start, self.kinship_matrix(row_persons)
+      for column_start in range(row_start + block_size, len(persons),
+          block_size):
+        column_persons = persons[column_start:column_start + block_size]
+        block = self.kinship_matrix(row_persons + column_persons)
+        yield row_start, column_start, block[:len(row_persons),
+            len(row_persons):]
+
+  def subfamily(self, persons):
+    """
+    A SubFamily view of `persons` and the relations among them,
+    sharing this family's storage rather than copying it
+    """
+    return SubFamily(self, persons)
+
+  def lineage(self, person, max_depth=None):
+    """
+    The subfamily of `person` with their ancestors and descendants
+    at most `max_depth` generations away
+    """
+    return self.subfamily([person] + self.ancestors(person, max_depth)
+        + self.descendants(person, max_depth))
+
   def gui_choose_person(self, message, title, persons=None):
     if persons == None:
       persons = self.persons()
@@ -503,6 +1290,83 @@ class Family:
     return new_person
 
 
+class SubFamily:
+  """
+  Some of a Family's people and the relations among them, as a
+  read-only view onto the family: nothing is copied, so making one
+  costs time proportional to the people in it, not the family.
+
+  Has the query methods the output generators need, so a SubFamily
+  can be rendered anywhere a Family can.
+  """
+  def __init__(self, family, persons):
+    self.family = family
+    # uid -> Person, in the order given
+    self._persons_by_uid = {person.uid: person for person in persons}
+
+  def __contains__(self, person):
+    return person.uid in self._persons_by_uid
+
+  def __len__(self):
+    return len(self._persons_by_uid)
+
+  def persons(self):
+    return list(self._persons_by_uid.values())
+
+  def uids(self):
+    return list(self._persons_by_uid)
+
+  def has_uid(self, uid):
+    return uid in self._persons_by_uid
+
+  def uid_to_person(self, uid):
+    try:
+      return self._persons_by_uid[uid]
+    except KeyError:
+      raise TypeError(f"No person has UID {uid}")
+
+  def display_string(self, person, style):
+    return self.family.display_string(person, style)
+
+  def labeller(self, style):
+    return self.family.labeller(style)
+
+  def _within(self, persons):
+    return [person for person in persons
+        if person.uid in self._persons_by_uid]
+
+  def _sources(self, relation_type):
+    graph = self.family.graph
+    return {person for person in self._persons_by_uid.values()
+        if self._within(graph.successors(person, relation_type))}
+
+  def children(self, parent):
+    if parent not in self:
+      raise PersonExistsError(
+          "{} isn't in the subfamily.".format(parent))
+    return set(self._within(self.family.children(parent)))
+
+  def fathers(self):
+    return self._sources("father")
+  def mothers(self):
+    return self._sources("mother")
+  def spouses(self):
+    return self._sources("spouse")
+
+  def father(self, person):
+    fathers = self._within(self.family.graph.predecessors(person, "father"))
+    return fathers[0] if fathers else None
+  def mother(self, person):
+    mothers = self._within(self.family.graph.predecessors(person, "mother"))
+    return mothers[0] if mothers else None
+  def all_spouses(self, person):
+    return self._within(self.family.all_spouses(person))
+
+  def generations(self):
+    return _generation_layers(self._persons_by_uid, self.family._parents,
+        self.family._all_spouses_either_way)
+
+
 def split_biglist(biglist):
   """
   Take `biglist` as would be returned from a .yaml file
@@ -561,9 +1425,8 @@ def split_biglist(biglist):
   return fathers, mothers, spouses
 
 
-def toml_to_family(toml_filename):
-  family = Family()
-
+def toml_to_family(toml_filename, backend="compact"):
+  import toml
   try:
     big_dict = toml.load(toml_filename)
   except toml.decoder.TomlDecodeError as e:
@@ -571,29 +1434,118 @@ def toml_to_family(toml_filename):
     print("  Maybe some names have special characters in them?\033[0m")
     raise e
 
-  # TODO Do this with defaultdict somehow not too verbosely
-  people  = big_dict['people'] if 'people' in big_dict else []
+  return dict_to_family(big_dict, backend)
 
-  father_uids = []
-  if 'father' in big_dict:
-    father_uids = [
-      father_tuple[0]
-      for father_tuple in big_dict['father']
-    ]
 
-  mother_uids = []
-  if 'mother' in big_dict:
-    mother_uids = [
-      mother_tuple[0]
-      for mother_tuple in big_dict['mother']
-    ]
+# Bump whenever Family, Person or the cache layout changes so that
+# caches written by older versions get rebuilt.
+CACHE_FORMAT_VERSION = 8
+CACHE_SUFFIX = ".pedigree-cache"
 
-  spouse_uids = []
-  if 'spouse' in big_dict:
-    spouse_uids = [
-      spouse_tuple[0]
-      for spouse_tuple in big_dict['spouse']
-    ]
+def cache_filename_for(toml_filename):
+  return toml_filename + CACHE_SUFFIX
+
+
+def _read_keyed_pickle(filename, key, value_type):
+  """
+  Return the `value_type` instance pickled in `filename` after
+  `key`, if the key matches, otherwise None.  Missing, stale and
+  corrupt files all count as misses.
+  """
+  import pickle
+  try:
+    with open(filename, 'rb') as pickle_file:
+      if pickle.load(pickle_file) != key:
+        return None
+      value = pickle.load(pickle_file)
+  except Exception:
+    return None
+  if not isinstance(value, value_type):
+    return None
+  return value
+
+
+def _write_keyed_pickle(filename, key, value):
+  """
+  Atomically replace `filename` with `key` followed by `value`.
+  Failing to write is never fatal since these files only save time.
+  """
+  import pickle
+  import tempfile
+  directory = os.path.dirname(os.path.abspath(filename))
+  try:
+    descriptor, temp_filename = tempfile.mkstemp(dir=directory,
+        suffix=os.path.splitext(filename)[1])
+  except OSError:
+    return
+  try:
+    with os.fdopen(descriptor, 'wb') as pickle_file:
+      pickle.dump(key, pickle_file, protocol=pickle.HIGHEST_PROTOCOL)
+      pickle.dump(value, pickle_file, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_filename, filename)
+  except (OSError, pickle.PicklingError, RecursionError):
+    if os.path.exists(temp_filename):
+      os.remove(temp_filename)
+
+
+def cached_toml_to_family(toml_filename, cache_filename=None, backend="compact"):
+  """
+  Like `toml_to_family` but keep a pickled copy of the Family next
+  to `toml_filename` and load that instead whenever the toml file's
+  size, mtime and content hash are unchanged.
+  """
+  import hashlib
+  if cache_filename == None:
+    cache_filename = cache_filename_for(toml_filename)
+
+  with open(toml_filename, 'rb') as toml_file:
+    stat = os.fstat(toml_file.fileno())
+    content = toml_file.read()
+  key = (CACHE_FORMAT_VERSION, backend, stat.st_size, stat.st_mtime_ns,
+      hashlib.sha256(content).hexdigest())
+
+  family = _read_keyed_pickle(cache_filename, key, Family)
+  if family is not None:
+    return family
+
+  import toml
+  try:
+    big_dict = toml.loads(content.decode('utf-8'))
+  except (toml.decoder.TomlDecodeError, UnicodeDecodeError) as e:
+    print(f"\033[0;31m{toml_filename} is not a well-formed toml file.")
+    print("  Maybe some names have special characters in them?\033[0m")
+    raise e
+
+  family = dict_to_family(big_dict, backend)
+  _write_keyed_pickle(cache_filename, key, family)
+  return family
+
+
+def group_relations(relation_tuples):
+  """
+  Group `[parent_uid, child_uid]` style tuples by their first
+  element in a single pass, keeping the order in which each
+  first element and each of its partners first appear and
+  dropping repeats.
+
+      >>> group_relations([[2, 7], [9, 11], [2, 16], [2, 7]])
+      {2: [7, 16], 9: [11]}
+  """
+  grouped = {}
+  for relation in relation_tuples:
+    grouped.setdefault(relation[0], {})[relation[1]] = None
+  return {uid: list(partners) for uid, partners in grouped.items()}
+
+
+def dict_to_family(big_dict, backend="compact"):
+  """
+  Build a Family from `big_dict` as loaded from a .toml file with
+  `people`, `father`, `mother` and `spouse` entries.
+  """
+  family = Family(backend=backend)
+
+  # TODO Do this with defaultdict somehow not too verbosely
+  people  = big_dict['people'] if 'people' in big_dict else []
 
   for person in people:
     if "uid" not in person:
@@ -602,55 +1554,36 @@ def toml_to_family(toml_filename):
       print("Every person needs a unique integer associated to them")
       continue
 
-    if person["uid"] in family.uids():
-      print("Warning: Next person with uid {person['uid']} will not")
+    if family.has_uid(person["uid"]):
+      print(f"Warning: Next person with uid {person['uid']} will not")
       print("be included.  uids should be unique integers")
       print(person)
       continue
 
     family.add_person(Person.from_dict(person))
 
-  for father_uid in father_uids:
-    try:
-      father = family.uid_to_person(father_uid)
-    except TypeError as e:
-      print(f"Warning: Nobody has uid {uid}, so he can't be anyone's")
-      print("father.  Skipping.")
-      continue
-    children = [
-      family.uid_to_person(relation[1])
-      for relation in big_dict['father']
-      if relation[0] == father_uid
-    ]
-    family.add_children(father, children)
-
-  for mother_uid in mother_uids:
-    try:
-      mother = family.uid_to_person(mother_uid)
-    except TypeError as e:
-      print(f"Warning: Nobody has uid {uid}, so she can't be anyone's")
-      print("mother.  Skipping.")
-      continue
-    children = [
-      family.uid_to_person(relation[1])
-      for relation in big_dict['mother']
-      if relation[0] == mother_uid
-    ]
-    family.add_children(mother, children)
-
-  for spouse_uid in spouse_uids:
+  for relation, pronoun in (("father", "he"), ("mother", "she")):
+    for parent_uid, child_uids in \
+        group_relations(big_dict.get(relation, [])).items():
+      try:
+        parent = family.uid_to_person(parent_uid)
+      except TypeError as e:
+        print(f"Warning: Nobody has uid {parent_uid}, so {pronoun} can't be anyone's")
+        print(f"{relation}.  Skipping.")
+        continue
+      family.add_children(parent,
+          [family.uid_to_person(uid) for uid in child_uids])
+
+  for spouse_uid, sub_spouse_uids in \
+      group_relations(big_dict.get('spouse', [])).items():
     try:
       spouse = family.uid_to_person(spouse_uid)
     except TypeError as e:
-      print(f"Warning: Nobody has uid {uid}, so they can't be anyone's")
+      print(f"Warning: Nobody has uid {spouse_uid}, so they can't be anyone's")
       print("spouse.  Skipping.")
       continue
-    spouses = [
-      family.uid_to_person(relation[1])
-      for relation in big_dict['spouse']
-      if relation[0] == spouse_uid
-    ]
-    family.add_spouses(spouse, spouses)
+    family.add_spouses(spouse,
+        [family.uid_to_person(uid) for uid in sub_spouse_uids])
 
   return family
 
@@ -811,14 +1744,7 @@ def biglist_to_family(biglist):
   return Family(*split_biglist(biglist))
 
 
-def d3_html_page_generator(family, liny, style):
-  """Yield lines of an html page showing connections"""
-
-  linys = ["both", "matri", "patri"]
-  if liny not in linys:
-    raise TypeError(f"Unknown liny '{liny}'.  Only know " + ", ".join(linys))
-
-  yield """<!DOCTYPE html>
+_D3_HTML_HEADER = """<!DOCTYPE html>
   <meta charset="utf-8">
   <style>
   .link {
@@ -863,62 +1789,30 @@ def d3_html_page_generator(family, liny, style):
   <script src="http://d3js.org/d3.v3.min.js"></script>
   <script>
 
-  var links = [];
+  var data = """
 
-  function addRelation(sourcey, targety, relationy, listy) {
-    listy.push({source: sourcey, target: targety, type: relationy})
-  }
-  family = {"""
-  yield '  "father": {'
-  if liny in ("patri", "both"):
-   for father in family.fathers():
-     yield '"{}": ['.format(father.display_string(style))
-     for child in family.children(father):
-       yield '"{}",\n'.format(child.display_string(style))
-     yield '],\n'
-  yield '},\n'
-  yield '"mother": {\n'
-  if liny in ("matri", "both"):
-    for mother in family.mothers():
-      yield '"{}": [\n'.format(mother.display_string(style))
-      for child in family.children(mother):
-        yield '"{}",\n'.format(child.display_string(style))
-      yield '],\n'
-  yield '},\n'
-  yield '"spouse": {\n'
-  for prime_spouse in family.spouses():
-    yield '"{}": [\n'.format(prime_spouse.display_string(style))
-    for spouse in family.all_spouses(prime_spouse):
-      yield '"{}",\n'.format(spouse.display_string(style))
-    yield '],\n'
-  yield '}\n'
-  yield """
-}
+# Turns the d3 html page's `data` into d3's nodes and links
+_D3_HTML_NODES = """;
 
-for (var relation in family) {
-  for (var relator in family[relation]) {
-    if (family[relation].hasOwnProperty(relator)) {
-      numChildren = family[relation][relator].length;
-      for (var i = 0; i < numChildren; i++) {
-        addRelation(relator, family[relation][relator][i], relation, links);
-      }
-    }
-  }
-}
+var types = %s;
 
-var nodes = {};
+var nodes = data.nodes.map(function(name) {
+  return {name: name};
+});
 
-// Compute the distinct nodes from the links.
-links.forEach(function(link) {
-  link.source = nodes[link.source] || (nodes[link.source] = {name: link.source});
-  link.target = nodes[link.target] || (nodes[link.target] = {name: link.target});
+var links = data.links.map(function(link) {
+  return {source: nodes[link[0]], target: nodes[link[1]],
+      type: types[link[2]]};
 });
 
-var width = 2 * 1260,
+""" % json.dumps(RELATION_TYPES)
+
+# The browser lays everyone out itself, live
+_D3_FORCE_LAYOUT = """var width = 2 * 1260,
     height = 2 * 800;
 
 var force = d3.layout.force()
-    .nodes(d3.values(nodes))
+    .nodes(nodes)
     .links(links)
     .size([width, height])
     .chargeDistance(400)
@@ -928,12 +1822,33 @@ var force = d3.layout.force()
     .on("tick", tick)
     .start();
 
-var svg = d3.select("body").append("svg")
-    .attr("width", width)
-    .attr("height", height);
+"""
 
-// Per-type markers, as they don't inherit styles.
-svg.append("defs").selectAll("marker")
+# Everyone is put where `data.positions` says, and only moved by dragging
+_D3_FIXED_LAYOUT = """var force = d3.layout.force()
+    .nodes(nodes)
+    .links(links)
+    .size([width, height])
+    .charge(0)
+    .gravity(0)
+    .linkStrength(0)
+    .friction(0)
+    .on("tick", tick);
+
+nodes.forEach(function(node, i) {
+  node.x = node.px = data.positions[i][0];
+  node.y = node.py = data.positions[i][1];
+});
+force.start().stop();
+
+"""
+
+_D3_HTML_DRAWING = """var svg = d3.select("body").append("svg")
+    .attr("width", width)
+    .attr("height", height);
+
+// Per-type markers, as they don't inherit styles.
+svg.append("defs").selectAll("marker")
     .data(["father", "mother", "spouse"])
   .enter().append("marker")
     .attr("id", function(d) { return d; })
@@ -983,15 +1898,161 @@ function transform(d) {
   return "translate(" + d.x + "," + d.y + ")";
 }
 
-</script>
+"""
+
+_D3_HTML_END = """</script>
 </body>
 </html>
 """
 
+# How the html page can lay people out: d3 in the browser, d3 from
+# force_layout, or on a canvas from layered_layout
+HTML_LAYOUTS = ("browser", "precomputed", "canvas")
+
+# Room around the outermost people in a precomputed d3 html page,
+# in pixels.  Names are written to the right of people.
+_D3_MARGIN = 20
+_D3_LABEL_ROOM = 200
+
+
+def _family_relations(family, liny):
+  """
+  Yield `(relation_type, person, relatives)` for each father and
+  his children, each mother and her children, and each spouse and
+  their spouses, for the fathers and mothers `liny` includes.  This
+  is the order relations appear in both outputs.
+  """
+  if liny in ("patri", "both"):
+    for father in family.fathers():
+      yield "father", father, family.children(father)
+  if liny in ("matri", "both"):
+    for mother in family.mothers():
+      yield "mother", mother, family.children(mother)
+  for prime_spouse in family.spouses():
+    yield "spouse", prime_spouse, family.all_spouses(prime_spouse)
+
+
+def _check_liny(liny):
+  linys = ["both", "matri", "patri"]
+  if liny not in linys:
+    raise TypeError(f"Unknown liny '{liny}'.  Only know " + ", ".join(linys))
+
+
+def _d3_name(name):
+  """`name` as a string in the d3 html page's `data`"""
+  # Nobody's name can end the <script> early
+  return json.dumps(name).replace("</", "<\\/")
+
+
+def _joined(fragments):
+  """Yield `fragments` separated by commas"""
+  fragments = iter(fragments)
+  for fragment in fragments:
+    yield fragment
+    break
+  for fragment in fragments:
+    yield ","
+    yield fragment
+
+
+def _d3_links(family, liny, index):
+  """
+  Yield `(source, target, relation type code)` for every relation,
+  in `_family_relations` order, by the people's `index` numbers
+  """
+  for relation_type, person, relatives in _family_relations(family, liny):
+    code = RELATION_TYPE_CODES[relation_type]
+    source = index[person.uid]
+    for relative in relatives:
+      yield source, index[relative.uid], code
+
+
+def _page_data(names, links, positions=None):
+  """
+  Yield the fragments of the `data` object the html pages embed:
+  nodes called `names`, as from `_d3_name`, `links` between them, as
+  from `_d3_links`, and optionally each node's `(x, y)` position
+  """
+  yield '{"nodes":['
+  yield from _joined(names)
+  yield '],"links":['
+  yield from _joined(f"[{source},{target},{code}]"
+      for source, target, code in links)
+  if positions != None:
+    yield '],"positions":['
+    yield from _joined(f"[{x:.1f},{y:.1f}]" for x, y in positions)
+  yield ']}'
+
+
+def _d3_html_page(names, links, positions=None):
+  """
+  Yield the d3 html page's fragments for nodes called `names`, as
+  from `_d3_name`, and `links` between them, as from `_d3_links`.
+  With `positions`, each node's `(x, y)` as from `force_layout`,
+  the page draws everyone there at once instead of laying them out
+  live.
+  """
+  yield _D3_HTML_HEADER
+  if positions == None:
+    yield from _page_data(names, links)
+    yield _D3_HTML_NODES
+    yield _D3_FORCE_LAYOUT
+    yield _D3_HTML_DRAWING
+  else:
+    positions = [(x + _D3_MARGIN, y + _D3_MARGIN) for x, y in positions]
+    yield from _page_data(names, links, positions)
+    yield _D3_HTML_NODES
+    width = max((x for x, y in positions), default=0)
+    height = max((y for x, y in positions), default=0)
+    yield (f"var width = {width + _D3_LABEL_ROOM:.0f},\n"
+        f"    height = {height + _D3_MARGIN:.0f};\n\n")
+    yield _D3_FIXED_LAYOUT
+    yield _D3_HTML_DRAWING
+    yield "tick();\n\n"
+  yield _D3_HTML_END
+
+
+def _check_html_layout(html_layout):
+  if html_layout not in HTML_LAYOUTS:
+    raise ValueError(
+        f"html_layout must be one of {HTML_LAYOUTS}, not {html_layout!r}")
+
+
+def d3_html_page_generator(family, liny, style, html_layout="browser"):
+  """
+  Yield lines of an html page showing connections.  With the
+  "precomputed" `html_layout` everyone's place is worked out here,
+  by `force_layout`, so the page opens at once and looks the same
+  every time instead of the browser simulating it.  The "canvas"
+  one gives `canvas_html_page_generator`'s page instead, for trees
+  too big for d3.
+  """
+
+  _check_liny(liny)
+  _check_html_layout(html_layout)
+  if html_layout == "canvas":
+    yield from canvas_html_page_generator(family, liny, style)
+    return
+  label = family.labeller(style)
+  # Refuse to draw anyone being their own ancestor
+  family.generations()
+
+  persons = family.persons()
+  index = {person.uid: i for i, person in enumerate(persons)}
+  positions = None
+  if html_layout == "precomputed":
+    placed = force_layout(family, liny)
+    positions = [placed[person.uid] for person in persons]
+  yield from _d3_html_page((_d3_name(label(person)) for person in persons),
+      _d3_links(family, liny, index), positions)
+
 def show_temp_floating_chart(family):
   """
   Create a floating chart in a temporary file and open it in the browser.
   """
+  import tempfile
+  import webbrowser
+  from urllib.request import pathname2url
 
   # Create a temporary file
   html_file_descriptor, html_filename = tempfile.mkstemp()
@@ -1011,6 +2072,10 @@ def show_temp_rigid_chart(family, first_names_only=False):
   """
   Create a rigid chart in a temporary file and open it in the browser.
   """
+  import subprocess
+  import tempfile
+  import webbrowser
+  from urllib.request import pathname2url
   # Create a temporary directory
   temp_dir = tempfile.mkdtemp()
 
@@ -1034,42 +2099,730 @@ def show_temp_rigid_chart(family, first_names_only=False):
 
   # Don't delete it since the user may want to examine it.
 
+def _dot_node_statement(uid, name):
+  return '  "{}" [label="{}", shape="box"];'.format(uid, name)
+
+
+def _dot_rank_statement(generation):
+  """Keep everyone in `generation` on the same level of the .svg"""
+  return "  {rank=same; " + " ".join('"{}";'.format(person.uid)
+      for person in generation) + "}"
+
+
+# .dot file statement for each relation_type's edges
+_DOT_EDGE_STATEMENTS = {
+  "father": '  "{}" -> "{}" [color=blue];',
+  "mother": '  "{}" -> "{}" [color=orange];',
+  "spouse": '  "{}" -> "{}" [style="dotted"];',
+}
+
+
 def dot_file_generator(family, liny, style):
   """Generate a graphviz .dot file"""
 
-  linys = ["both", "matri", "patri"]
-  if liny not in linys:
-    raise TypeError(f"Unknown liny '{liny}'.  Only know " + ", ".join(linys))
+  _check_liny(liny)
+  label = family.labeller(style)
 
   yield "digraph family_tree {"
 
   # Set up the nodes
   for person in family.persons():
-    uid = person.uid
-    name = person.display_string(style)
-    yield '  "{}" [label="{}", shape="box"];'.format(
-        uid, name)
+    yield _dot_node_statement(person.uid, label(person))
+
+  # One level per generation
+  for generation in family.generations():
+    yield _dot_rank_statement(generation)
 
   # Set up the connections
-  if liny in ["patri", "both"]:
-    for father in family.fathers():
-      for child in family.children(father):
-        yield '  "{}" -> "{}" [color=blue];'.format(
-            father.uid, 
-            child.uid)
-  if liny in ["matri", "both"]:
-    for mother in family.mothers():
-      for child in family.children(mother):
-        yield '  "{}" -> "{}" [color=orange];'.format(
-            mother.uid,
-            child.uid)
-  for prime_spouse in family.spouses():
-    for spouse in family.all_spouses(prime_spouse):
-      yield '  "{}" -> "{}" [style="dotted"];'.format(
-          prime_spouse.uid,
-          spouse.uid)
+  for relation_type, person, relatives in _family_relations(family, liny):
+    statement = _DOT_EDGE_STATEMENTS[relation_type]
+    for relative in relatives:
+      yield statement.format(person.uid, relative.uid)
   yield "}"
 
+def layered_layout(family, liny="both", sweeps=4):
+  """
+  Order everyone for drawing in layers, one per generation: a list
+  of layers, each a list of Persons from left to right.  Layers are
+  swept down and back up `sweeps` times, each time putting everyone
+  in the order of the average position of their parents (then of
+  their children), the barycentric heuristic for fewer crossings.
+  People without any take the place of their spouse.  Every sweep
+  is linear in the number of people and relations, bar sorting.
+  """
+  _check_liny(liny)
+  layers = [list(generation) for generation in family.generations()]
+
+  parents, children, spouses = {}, {}, {}
+  for relation_type, person, relatives in _family_relations(family, liny):
+    for relative in relatives:
+      if relation_type == "spouse":
+        spouses.setdefault(person.uid, []).append(relative.uid)
+        spouses.setdefault(relative.uid, []).append(person.uid)
+      else:
+        children.setdefault(person.uid, []).append(relative.uid)
+        parents.setdefault(relative.uid, []).append(person.uid)
+
+  # uid -> where they are across their layer, from 0 to 1
+  position = {}
+  def place(layer):
+    for index, person in enumerate(layer):
+      position[person.uid] = (index + 0.5) / len(layer)
+  for layer in layers:
+    place(layer)
+
+  def reorder(layer, neighbors):
+    def barycenter(person):
+      uids = neighbors.get(person.uid) or spouses.get(person.uid)
+      if not uids:
+        return position[person.uid]
+      return sum(position[uid] for uid in uids) / len(uids)
+    layer.sort(key=barycenter)
+    place(layer)
+
+  for _ in range(sweeps):
+    for layer in layers[1:]:
+      reorder(layer, parents)
+    for layer in reversed(layers[:-1]):
+      reorder(layer, children)
+  return layers
+
+
+def _pairs_near(position, distance):
+  """
+  Indexes `(first, second)` of every pair of points in `position`,
+  an n x 2 numpy array, that might be within `distance` of each
+  other: those in the same or neighboring cells of a grid of
+  `distance` sized cells, each pair once.
+  """
+  import numpy as np
+
+  if len(position) == 0:
+    return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.intp)
+  cells = np.floor(position / distance).astype(np.int64)
+  cells -= cells.min(axis=0)
+  # Padded by a cell each side so neighboring keys don't wrap
+  columns = cells[:, 0].max() + 3
+  keys = (cells[:, 1] + 1) * columns + cells[:, 0] + 1
+  order = np.argsort(keys, kind="stable")
+  sorted_keys = keys[order]
+
+  firsts, seconds = [], []
+  # Half the neighboring cells, as the other half see these from
+  # their side
+  for dx, dy in ((0, 0), (1, 0), (-1, 1), (0, 1), (1, 1)):
+    neighbors = keys + dy * columns + dx
+    start = np.searchsorted(sorted_keys, neighbors, "left")
+    counts = np.searchsorted(sorted_keys, neighbors, "right") - start
+    first = np.repeat(np.arange(len(position)), counts)
+    offsets = np.arange(len(first)) - np.repeat(np.cumsum(counts) - counts,
+        counts)
+    second = order[np.repeat(start, counts) + offsets]
+    if dx == dy == 0:
+      first, second = first[first < second], second[first < second]
+    firsts.append(first)
+    seconds.append(second)
+  return np.concatenate(firsts), np.concatenate(seconds)
+
+
+def force_layout(family, liny="both", iterations=50, distance=60):
+  """
+  Place everyone in the plane the way d3's force layout would, with
+  relatives about `distance` apart and everyone else pushed away
+  from each other, but computed in advance with numpy: a dict of
+  uid to `(x, y)`, with the smallest x and y 0.
+
+  Starts from `layered_layout`, so the same family always comes out
+  the same, and runs `iterations` steps of Fruchterman-Reingold,
+  moving less each time.  People only push away those within three
+  `distance`s, so each step takes time linear in the family's size.
+  """
+  import numpy as np
+
+  layers = layered_layout(family, liny)
+  persons = [person for layer in layers for person in layer]
+  index = {person.uid: i for i, person in enumerate(persons)}
+  position = np.empty((len(persons), 2))
+  start = 0
+  for depth, layer in enumerate(layers):
+    end = start + len(layer)
+    position[start:end, 0] = (np.arange(len(layer)) - (len(layer) - 1) / 2) \
+        * distance
+    position[start:end, 1] = depth * 2 * distance
+    start = end
+
+  sources, targets = [], []
+  for relation_type, person, relatives in _family_relations(family, liny):
+    for relative in relatives:
+      sources.append(index[person.uid])
+      targets.append(index[relative.uid])
+  sources = np.array(sources, dtype=np.intp)
+  targets = np.array(targets, dtype=np.intp)
+
+  def total(indexes, forces):
+    return np.stack([np.bincount(indexes, weights=forces[:, axis],
+        minlength=len(persons)) for axis in (0, 1)], axis=1)
+
+  for step in range(iterations):
+    temperature = distance * (1 - step / iterations)
+
+    # Everyone near each other pushes apart by distance^2 / how far
+    first, second = _pairs_near(position, 3 * distance)
+    apart = position[first] - position[second]
+    squared = np.maximum((apart ** 2).sum(axis=1), 1e-6)
+    push = apart * np.where(squared < (3 * distance) ** 2,
+        distance ** 2 / squared, 0)[:, None]
+    displacement = total(first, push) - total(second, push)
+
+    # Relatives pull together by how far^2 / distance
+    apart = position[targets] - position[sources]
+    pull = apart * (np.sqrt((apart ** 2).sum(axis=1)) / distance)[:, None]
+    displacement += total(sources, pull) - total(targets, pull)
+
+    length = np.maximum(np.sqrt((displacement ** 2).sum(axis=1)), 1e-9)
+    position += displacement * (np.minimum(length, temperature)
+        / length)[:, None]
+
+  if len(persons):
+    position -= position.min(axis=0)
+  return {person.uid: (float(x), float(y))
+      for person, (x, y) in zip(persons, position)}
+
+
+# Sizes in the .svg written by svg_file_generator, in pixels
+_SVG_CHARACTER_WIDTH = 7
+_SVG_BOX_HEIGHT = 24
+_SVG_BOX_PADDING = 8
+_SVG_BOX_GAP = 16
+_SVG_LAYER_GAP = 56
+_SVG_MARGIN = 16
+
+_SVG_STYLE = ("<style>path{fill:none}.father{stroke:blue}"
+    ".mother{stroke:orange}.spouse{stroke:black;stroke-dasharray:2,3}"
+    "rect{fill:white;stroke:black}text{text-anchor:middle}</style>")
+
+
+def _layered_boxes(family, liny, label, sweeps=4):
+  """
+  Where `layered_layout` puts everyone's box, labelled by `label`,
+  in pixels: a dict of uid to `(center x, top y, width, label)`, and
+  the width and height of the whole tree
+  """
+  layers = layered_layout(family, liny, sweeps)
+
+  boxes = {}
+  widths = [[len(label(person)) * _SVG_CHARACTER_WIDTH + 2 * _SVG_BOX_PADDING
+      for person in layer] for layer in layers]
+  layer_widths = [sum(layer) + _SVG_BOX_GAP * (len(layer) - 1)
+      for layer in widths]
+  width = max(layer_widths, default=0) + 2 * _SVG_MARGIN
+  height = len(layers) * (_SVG_BOX_HEIGHT + _SVG_LAYER_GAP) \
+      - _SVG_LAYER_GAP + 2 * _SVG_MARGIN
+  for index, layer in enumerate(layers):
+    x = (width - layer_widths[index]) / 2
+    y = _SVG_MARGIN + index * (_SVG_BOX_HEIGHT + _SVG_LAYER_GAP)
+    for person, box_width in zip(layer, widths[index]):
+      boxes[person.uid] = (x + box_width / 2, y, box_width, label(person))
+      x += box_width + _SVG_BOX_GAP
+  return boxes, width, height
+
+
+def svg_file_generator(family, liny, style, sweeps=4):
+  """
+  Generate an .svg tree like graphviz would from the .dot file,
+  but laid out in-process by `layered_layout`, in time and memory
+  close to linear in the size of the family
+  """
+  from html import escape
+
+  boxes, width, height = _layered_boxes(family, liny,
+      family.labeller(style), sweeps)
+
+  yield '<?xml version="1.0" encoding="UTF-8"?>'
+  yield (f'<svg xmlns="http://www.w3.org/2000/svg" width="{width:.0f}" '
+      f'height="{height:.0f}" viewBox="0 0 {width:.0f} {height:.0f}" '
+      'font-family="sans-serif" font-size="12">')
+  yield _SVG_STYLE
+
+  # Relations first so that boxes are drawn over them
+  for relation_type, person, relatives in _family_relations(family, liny):
+    x1, y1 = boxes[person.uid][:2]
+    for relative in relatives:
+      x2, y2 = boxes[relative.uid][:2]
+      if relation_type == "spouse":
+        middle = y1 + _SVG_BOX_HEIGHT / 2
+        yield (f'<path class="spouse" d="M{x1:.1f},{middle:.1f} '
+            f'L{x2:.1f},{y2 + _SVG_BOX_HEIGHT / 2:.1f}"/>')
+      else:
+        bottom = y1 + _SVG_BOX_HEIGHT
+        bend = (bottom + y2) / 2
+        yield (f'<path class="{relation_type}" d="M{x1:.1f},{bottom:.1f} '
+            f'C{x1:.1f},{bend:.1f} {x2:.1f},{bend:.1f} {x2:.1f},{y2:.1f}"/>')
+
+  for x, y, box_width, name in boxes.values():
+    yield (f'<rect x="{x - box_width / 2:.1f}" y="{y:.1f}" '
+        f'width="{box_width:.0f}" height="{_SVG_BOX_HEIGHT}"/>'
+        f'<text x="{x:.1f}" y="{y + _SVG_BOX_HEIGHT / 2 + 4:.1f}">'
+        f'{escape(name)}</text>')
+  yield '</svg>'
+
+_CANVAS_HTML_HEADER = """<!DOCTYPE html>
+<meta charset="utf-8">
+<style>
+html, body {
+  margin: 0;
+  height: 100%;
+  overflow: hidden;
+}
+
+canvas {
+  display: block;
+  cursor: grab;
+}
+
+#name {
+  position: absolute;
+  display: none;
+  pointer-events: none;
+  padding: 2px 4px;
+  font: 12px sans-serif;
+  background: #fff;
+  border: 1px solid #333;
+}
+</style>
+<body>
+<canvas></canvas>
+<div id="name"></div>
+<script>
+
+var data = """
+
+# Draws `data` on a canvas, looking up only what's in view (and what's
+# under the mouse) in quadtrees of everyone's and every relation's
+# bounding box.  Names are only drawn once they're big enough to read,
+# and people are drawn as plain squares until they're big enough to
+# tell apart.
+_CANVAS_HTML_SCRIPT = """;
+
+var types = %s,
+    colors = ["blue", "red", "#999"],
+    radius = 6,
+    fontSize = 12,
+    smallestReadableFont = 6,
+    mostNames = 3000,
+    mostLinks = 50000,
+    nameWidth = 400;
+
+var count = data.nodes.length,
+    xs = new Float64Array(count),
+    ys = new Float64Array(count);
+data.positions.forEach(function(position, i) {
+  xs[i] = position[0];
+  ys[i] = position[1];
+});
+
+// A quadtree of boxes, [x0, y0, x1, y1] for each item in `boxes`,
+// that keeps every box in the smallest cell it fits in
+function Quadtree(boxes) {
+  var x0 = Infinity, y0 = Infinity, x1 = -Infinity, y1 = -Infinity;
+  for (var j = 0; j < boxes.length; j += 4) {
+    x0 = Math.min(x0, boxes[j]);
+    y0 = Math.min(y0, boxes[j + 1]);
+    x1 = Math.max(x1, boxes[j + 2]);
+    y1 = Math.max(y1, boxes[j + 3]);
+  }
+  var size = Math.max(x1 - x0, y1 - y0, 1);
+  this.boxes = boxes;
+  this.root = this.cell(x0, y0, size, 0);
+  for (var item = 0; item < boxes.length / 4; item++) {
+    this.insert(this.root, item);
+  }
+}
+
+Quadtree.prototype.capacity = 32;
+Quadtree.prototype.maxDepth = 20;
+
+Quadtree.prototype.cell = function(x, y, size, depth) {
+  return {x: x, y: y, size: size, depth: depth, items: [], children: null};
+};
+
+// The child of `cell` the box at `j` fits in, if any
+Quadtree.prototype.childFor = function(cell, j) {
+  var b = this.boxes,
+      half = cell.size / 2,
+      middleX = cell.x + half,
+      middleY = cell.y + half,
+      column = b[j + 2] <= middleX ? 0 : b[j] >= middleX ? 1 : -1,
+      row = b[j + 3] <= middleY ? 0 : b[j + 1] >= middleY ? 1 : -1;
+  return column < 0 || row < 0 ? null : cell.children[2 * row + column];
+};
+
+Quadtree.prototype.insert = function(cell, item) {
+  for (var child = cell; child !== null; child = cell.children === null ?
+      null : this.childFor(cell, 4 * item)) {
+    cell = child;
+  }
+  cell.items.push(item);
+  if (cell.children === null && cell.items.length > this.capacity &&
+      cell.depth < this.maxDepth) {
+    var half = cell.size / 2, depth = cell.depth + 1, items = cell.items;
+    cell.children = [this.cell(cell.x, cell.y, half, depth),
+        this.cell(cell.x + half, cell.y, half, depth),
+        this.cell(cell.x, cell.y + half, half, depth),
+        this.cell(cell.x + half, cell.y + half, half, depth)];
+    cell.items = [];
+    for (var i = 0; i < items.length; i++) {
+      this.insert(cell, items[i]);
+    }
+  }
+};
+
+// Call `callback` with every item whose box meets x0,y0 - x1,y1
+Quadtree.prototype.visit = function(x0, y0, x1, y1, callback) {
+  var b = this.boxes, cells = [this.root];
+  while (cells.length) {
+    var cell = cells.pop();
+    if (cell.x > x1 || cell.y > y1 || cell.x + cell.size < x0 ||
+        cell.y + cell.size < y0) {
+      continue;
+    }
+    for (var i = 0; i < cell.items.length; i++) {
+      var j = 4 * cell.items[i];
+      if (b[j] <= x1 && b[j + 1] <= y1 && b[j + 2] >= x0 && b[j + 3] >= y0) {
+        callback(cell.items[i]);
+      }
+    }
+    if (cell.children !== null) {
+      cells.push.apply(cells, cell.children);
+    }
+  }
+};
+
+var nodeBoxes = new Float64Array(4 * count);
+for (var i = 0; i < count; i++) {
+  nodeBoxes.set([xs[i] - radius, ys[i] - radius, xs[i] + radius,
+      ys[i] + radius], 4 * i);
+}
+var nodeTree = new Quadtree(nodeBoxes);
+
+var linkBoxes = new Float64Array(4 * data.links.length);
+data.links.forEach(function(link, l) {
+  var source = link[0], target = link[1];
+  linkBoxes.set([Math.min(xs[source], xs[target]),
+      Math.min(ys[source], ys[target]), Math.max(xs[source], xs[target]),
+      Math.max(ys[source], ys[target])], 4 * l);
+});
+var linkTree = new Quadtree(linkBoxes);
+
+var canvas = document.querySelector("canvas"),
+    context = canvas.getContext("2d"),
+    label = document.getElementById("name"),
+    ratio = window.devicePixelRatio || 1,
+    width, height,
+    // Screen position = world position * scale + offset
+    scale = 1, offsetX = 0, offsetY = 0,
+    hovered = -1,
+    drawPending = false;
+
+function redraw() {
+  if (!drawPending) {
+    drawPending = true;
+    window.requestAnimationFrame(draw);
+  }
+}
+
+// Whether the line from person a to person b, whose bounding box
+// meets x0,y0 - x1,y1, crosses it: not all its corners are on the
+// same side of the line
+function crosses(a, b, x0, y0, x1, y1) {
+  var dx = xs[b] - xs[a], dy = ys[b] - ys[a],
+      // Each corner's side of the line, by sign
+      corner00 = dx * (y0 - ys[a]) - dy * (x0 - xs[a]),
+      corner10 = dx * (y0 - ys[a]) - dy * (x1 - xs[a]),
+      corner01 = dx * (y1 - ys[a]) - dy * (x0 - xs[a]),
+      corner11 = dx * (y1 - ys[a]) - dy * (x1 - xs[a]);
+  return Math.min(corner00, corner10, corner01, corner11) <= 0 &&
+      Math.max(corner00, corner10, corner01, corner11) >= 0;
+}
+
+function draw() {
+  drawPending = false;
+  context.setTransform(1, 0, 0, 1, 0, 0);
+  context.clearRect(0, 0, canvas.width, canvas.height);
+  context.setTransform(ratio * scale, 0, 0, ratio * scale,
+      ratio * offsetX, ratio * offsetY);
+
+  var x0 = -offsetX / scale, y0 = -offsetY / scale,
+      x1 = (width - offsetX) / scale, y1 = (height - offsetY) / scale;
+
+  var byType = types.map(function() { return []; }), seen = 0;
+  linkTree.visit(x0, y0, x1, y1, function(l) {
+    var link = data.links[l];
+    if (crosses(link[0], link[1], x0, y0, x1, y1)) {
+      byType[link[2]].push(l);
+      seen++;
+    }
+  });
+  // Too many to draw quickly are too many to tell apart, so only
+  // draw a sample of them
+  var step = Math.ceil(seen / mostLinks);
+  context.lineWidth = 1.5 / scale;
+  byType.forEach(function(links, type) {
+    context.beginPath();
+    for (var k = 0; k < links.length; k += step) {
+      var link = data.links[links[k]];
+      context.moveTo(xs[link[0]], ys[link[0]]);
+      context.lineTo(xs[link[1]], ys[link[1]]);
+    }
+    context.strokeStyle = colors[type];
+    context.stroke();
+  });
+
+  // Names hang below people, so look a little further up for them
+  var shown = [], showNames = scale * fontSize >= smallestReadableFont;
+  nodeTree.visit(x0 - nameWidth / 2, y0 - fontSize - radius,
+      x1 + nameWidth / 2, y1, function(i) {
+    shown.push(i);
+  });
+  context.beginPath();
+  if (scale * radius < 2) {
+    var half = 1 / scale;
+    shown.forEach(function(i) {
+      context.rect(xs[i] - half, ys[i] - half, 2 * half, 2 * half);
+    });
+    context.fillStyle = "#333";
+    context.fill();
+  } else {
+    shown.forEach(function(i) {
+      context.moveTo(xs[i] + radius, ys[i]);
+      context.arc(xs[i], ys[i], radius, 0, 2 * Math.PI);
+    });
+    context.fillStyle = "#ccc";
+    context.fill();
+    context.strokeStyle = "#333";
+    context.stroke();
+  }
+
+  if (showNames && shown.length <= mostNames) {
+    context.font = fontSize + "px sans-serif";
+    context.textAlign = "center";
+    context.fillStyle = "#000";
+    shown.forEach(function(i) {
+      context.fillText(data.nodes[i], xs[i], ys[i] + radius + fontSize);
+    });
+  }
+
+  if (hovered >= 0) {
+    context.beginPath();
+    context.arc(xs[hovered], ys[hovered], Math.max(radius, 4 / scale), 0,
+        2 * Math.PI);
+    context.fillStyle = "orange";
+    context.fill();
+  }
+}
+
+function resize() {
+  width = window.innerWidth;
+  height = window.innerHeight;
+  canvas.width = width * ratio;
+  canvas.height = height * ratio;
+  canvas.style.width = width + "px";
+  canvas.style.height = height + "px";
+  redraw();
+}
+
+// Start with the whole tree in view
+function fit() {
+  var root = nodeTree.root;
+  scale = Math.min(window.innerWidth, window.innerHeight) / root.size;
+  offsetX = -root.x * scale;
+  offsetY = -root.y * scale;
+}
+
+// The person under the screen position x, y, if any
+function personAt(x, y) {
+  var worldX = (x - offsetX) / scale, worldY = (y - offsetY) / scale,
+      reach = Math.max(radius, 4 / scale), nearest = -1, best = Infinity;
+  nodeTree.visit(worldX - reach, worldY - reach, worldX + reach,
+      worldY + reach, function(i) {
+    var distance = Math.hypot(xs[i] - worldX, ys[i] - worldY);
+    if (distance <= reach && distance < best) {
+      nearest = i;
+      best = distance;
+    }
+  });
+  return nearest;
+}
+
+var dragging = null;
+
+canvas.addEventListener("mousedown", function(event) {
+  dragging = {x: event.clientX, y: event.clientY};
+  canvas.style.cursor = "grabbing";
+});
+
+window.addEventListener("mouseup", function() {
+  dragging = null;
+  canvas.style.cursor = "grab";
+});
+
+canvas.addEventListener("mousemove", function(event) {
+  if (dragging !== null) {
+    offsetX += event.clientX - dragging.x;
+    offsetY += event.clientY - dragging.y;
+    dragging = {x: event.clientX, y: event.clientY};
+    redraw();
+    return;
+  }
+  var person = personAt(event.clientX, event.clientY);
+  if (person !== hovered) {
+    hovered = person;
+    redraw();
+  }
+  if (person < 0) {
+    label.style.display = "none";
+  } else {
+    label.textContent = data.nodes[person];
+    label.style.left = event.clientX + 12 + "px";
+    label.style.top = event.clientY + 12 + "px";
+    label.style.display = "block";
+  }
+});
+
+canvas.addEventListener("wheel", function(event) {
+  event.preventDefault();
+  var factor = Math.exp(-event.deltaY * 0.002);
+  offsetX = event.clientX - (event.clientX - offsetX) * factor;
+  offsetY = event.clientY - (event.clientY - offsetY) * factor;
+  scale *= factor;
+  redraw();
+}, {passive: false});
+
+window.addEventListener("resize", resize);
+fit();
+resize();
+
+</script>
+</body>
+</html>
+""" % json.dumps(RELATION_TYPES)
+
+
+def canvas_html_page_generator(family, liny, style, sweeps=4):
+  """
+  Yield the fragments of an html page drawing the family, laid out
+  in generations like `svg_file_generator`'s, on a canvas rather
+  than as an element per person and relation.  It only draws what's
+  in view, looked up in quadtrees, and leaves out names until
+  they're readable, so it stays usable for hundreds of thousands of
+  people.
+  """
+  _check_liny(liny)
+  boxes, width, height = _layered_boxes(family, liny, family.labeller(style),
+      sweeps)
+  index = {uid: i for i, uid in enumerate(boxes)}
+
+  yield _CANVAS_HTML_HEADER
+  yield from _page_data((_d3_name(box[3]) for box in boxes.values()),
+      _d3_links(family, liny, index),
+      [(x, top + _SVG_BOX_HEIGHT / 2) for x, top, _, _ in boxes.values()])
+  yield _CANVAS_HTML_SCRIPT
+
+
+# Roughly how many characters ChunkedWriter collects before writing
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+# How many fragments ChunkedWriter joins at once
+_FRAGMENT_BATCH = 512
+
+class ChunkedWriter:
+  """
+  Collect str fragments, each followed by `end`, and write them
+  UTF-8 encoded to each of the binary `streams` in chunks of at
+  least `chunk_size` characters instead of once per fragment.
+  Fragments are joined a batch at a time, so nothing is done in
+  Python per fragment.
+
+  A stream that breaks its pipe (a `dot` or `head` that exits early)
+  is dropped; BrokenPipeError is only raised once every stream is
+  gone.  Use as a context manager, or call `flush()` when done.
+  The streams themselves are left open.
+  """
+  def __init__(self, *streams, chunk_size=DEFAULT_CHUNK_SIZE, end=""):
+    self.streams = list(streams)
+    self.chunk_size = chunk_size
+    self.end = end
+    # Joined batches of fragments not written yet
+    self._batches = []
+    self._size = 0
+
+  def write(self, fragment):
+    self.writelines((fragment,))
+
+  def writelines(self, fragments):
+    fragments = iter(fragments)
+    end = self.end
+    while True:
+      batch = list(islice(fragments, _FRAGMENT_BATCH))
+      if not batch:
+        break
+      joined = end.join(batch) + end if end else "".join(batch)
+      self._batches.append(joined)
+      self._size += len(joined)
+      if self._size >= self.chunk_size:
+        self._write_chunk()
+
+  def _write_chunk(self):
+    chunk = "".join(self._batches).encode()
+    self._batches = []
+    self._size = 0
+    for stream in list(self.streams):
+      try:
+        stream.write(chunk)
+      except BrokenPipeError:
+        self.streams.remove(stream)
+    if not self.streams:
+      raise BrokenPipeError("Every stream has been closed")
+
+  def flush(self):
+    if self._batches:
+      self._write_chunk()
+    for stream in list(self.streams):
+      try:
+        stream.flush()
+      except BrokenPipeError:
+        self.streams.remove(stream)
+
+  def __enter__(self):
+    return self
+
+  def __exit__(self, exception_type, exception, traceback):
+    if exception_type == None:
+      self.flush()
+
+
+def write_d3_html_page(family, liny, style, *streams,
+    chunk_size=DEFAULT_CHUNK_SIZE, html_layout="browser"):
+  """Write `d3_html_page_generator`'s page to the binary `streams`"""
+  with ChunkedWriter(*streams, chunk_size=chunk_size) as writer:
+    writer.writelines(d3_html_page_generator(family, liny, style,
+        html_layout))
+
+
+def write_dot_file(family, liny, style, *streams,
+    chunk_size=DEFAULT_CHUNK_SIZE):
+  """Write `dot_file_generator`'s lines to the binary `streams`"""
+  with ChunkedWriter(*streams, chunk_size=chunk_size, end="\n") as writer:
+    writer.writelines(dot_file_generator(family, liny, style))
+
+
+def write_svg_file(family, liny, style, *streams,
+    chunk_size=DEFAULT_CHUNK_SIZE):
+  """Write `svg_file_generator`'s lines to the binary `streams`"""
+  with ChunkedWriter(*streams, chunk_size=chunk_size, end="\n") as writer:
+    writer.writelines(svg_file_generator(family, liny, style))
+
+
 def interact(yaml_filename):
   with open(yaml_filename) as yaml_file:
     family = yaml_to_family(yaml_file)
@@ -1157,7 +2910,7 @@ def interact(yaml_filename):
       if person:
         new_name = easygui.enterbox(
             "Enter {}'s new name".format(person.name, titlebar))
-        if new_name:
+        if new_name and new_name.strip():
             family.change_name(person, new_name)
         change_made = True
     if next_move == "p. Add a note to a person":
@@ -1230,36 +2983,791 @@ def interact(yaml_filename):
           yaml_file.write(family_to_yaml(family))
 
 
-def cleanup_files(yaml_filename, base_filename):
-  for extension in 'svg', 'dot', 'html':
-    os.remove('{}.{}'.format(base_filename, extension))
+def cleanup_files(toml_filename, base_filename):
+  for extension in RENDER_TARGETS:
+    if os.path.exists('{}.{}'.format(base_filename, extension)):
+      os.remove('{}.{}'.format(base_filename, extension))
+  for filename in (cache_filename_for(toml_filename),
+      base_filename + SNAPSHOT_SUFFIX):
+    if os.path.exists(filename):
+      os.remove(filename)
+  if os.path.isdir(base_filename + EXPLORER_SUFFIX):
+    import shutil
+    shutil.rmtree(base_filename + EXPLORER_SUFFIX)
+
+
+# Every kind of output file, named by its extension
+RENDER_TARGETS = ("html", "dot", "svg")
+
+# What can lay out the .svg file: graphviz's dot, or layered_layout
+SVG_LAYOUTS = ("graphviz", "layered")
+
+class RenderError(Exception):
+  pass
+
+
+def _write_fragments(fragments, filename, end=""):
+  with open(filename, 'wb') as f:
+    with ChunkedWriter(f, end=end) as writer:
+      writer.writelines(fragments)
+
+
+def _write_dot_and_svg_files(dot_lines, file_basename, targets):
+  """
+  Write the .dot file's lines, as they're generated, to XXX.dot
+  and/or straight into graphviz's `dot -Tsvg` writing XXX.svg, then
+  wait for graphviz to finish.
+  """
+  import subprocess
+  import tempfile
+
+  sinks = []
+  if "dot" in targets:
+    sinks.append(open('{}.dot'.format(file_basename), 'wb'))
+
+  process = None
+  if "svg" in targets:
+    svg_file = open('{}.svg'.format(file_basename), 'wb')
+    # Not a pipe so that a chatty graphviz can't fill it and stall
+    # while we're still writing to its stdin
+    errors_file = tempfile.TemporaryFile()
+    try:
+      process = subprocess.Popen(['dot', '-Tsvg'],
+          stdin=subprocess.PIPE, stdout=svg_file, stderr=errors_file)
+      sinks.append(process.stdin)
+    except FileNotFoundError as e:
+      print("'dot' executable not available.  You need to install 'graphviz'")
+      print("from your package manager if you want to get an .svg file.")
+
+  try:
+    with ChunkedWriter(*sinks, end="\n") as writer:
+      writer.writelines(dot_lines)
+  except BrokenPipeError:
+    # Only graphviz was left and it gave up early; its exit status
+    # says why
+    pass
+  finally:
+    for sink in sinks:
+      try:
+        sink.close()
+      except BrokenPipeError:
+        pass
+
+  if "svg" in targets:
+    if process != None:
+      process.wait()
+    svg_file.close()
+    errors_file.seek(0)
+    errors = errors_file.read().decode(errors='replace').strip()
+    errors_file.close()
+    if process != None and process.returncode != 0:
+      raise RenderError(
+          f"'dot -Tsvg' exited with status {process.returncode}"
+          + (f":\n{errors}" if errors else ""))
+
+
+def _run_render_jobs(jobs):
+  """
+  Run each `(name, function, *args)` in `jobs` in its own thread.
+  Once they're all done, raise every failure together as a
+  RenderError.
+
+  Python code in the threads still takes turns holding the GIL, so
+  generating the html and the .dot text doesn't get any faster.
+  What runs in parallel is the `dot` subprocess, which lays out the
+  .svg file while the other targets are being generated.
+  """
+  from concurrent.futures import ThreadPoolExecutor
+
+  if not jobs:
+    return
+  with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+    futures = [(job[0], pool.submit(*job[1:])) for job in jobs]
+
+  failures = []
+  for name, future in futures:
+    try:
+      future.result()
+    except (OSError, RenderError) as e:
+      failures.append(f"{name}: {e}")
+  if failures:
+    raise RenderError("\n".join(failures))
+
+
+def _check_layout(layout):
+  if layout not in SVG_LAYOUTS:
+    raise ValueError(f"layout must be one of {SVG_LAYOUTS}, not {layout!r}")
+
 
+def render_files(family, file_basename, liny, style, targets=RENDER_TARGETS,
+    layout="graphviz", html_layout="browser"):
+  """
+  Write XXX.html, XXX.dot and XXX.svg (or whichever of them are in
+  `targets`) for `family` at the same time.  The html page is
+  rendered alongside the .dot file, which is generated once for
+  both itself and graphviz.  Only graphviz really runs in parallel
+  with the rest; see `_run_render_jobs`.  With the "layered" `layout` the .svg
+  file is laid out in-process instead and graphviz isn't needed.
+  `html_layout` is passed on to `d3_html_page_generator`.
+
+  Every target is attempted even if another fails.  Failures are
+  then raised together as a RenderError.
+  """
+  _check_layout(layout)
+
+  dot_targets = [target for target in targets
+      if target == "dot" or (target == "svg" and layout == "graphviz")]
+  jobs = []
+  if dot_targets:
+    jobs.append(("dot/svg", _write_dot_and_svg_files,
+        dot_file_generator(family, liny, style), file_basename, dot_targets))
+  if "svg" in targets and layout == "layered":
+    jobs.append(("svg", _write_fragments,
+        svg_file_generator(family, liny, style),
+        '{}.svg'.format(file_basename), "\n"))
+  if "html" in targets:
+    jobs.append(("html", _write_fragments,
+        d3_html_page_generator(family, liny, style, html_layout),
+        '{}.html'.format(file_basename)))
+  _run_render_jobs(jobs)
+
+
+SNAPSHOT_FORMAT_VERSION = 5
+SNAPSHOT_SUFFIX = ".pedigree-snapshot"
+
+class RenderSnapshot:
+  """
+  Everything `render_files_incrementally` rendered for a family,
+  keyed by the people and relations each piece was rendered from,
+  so the next run only renders what changed.
+  """
+  def __init__(self, liny, style, layout="graphviz", html_layout="browser"):
+    self.liny = liny
+    self.style = style
+    self.layout = layout
+    self.html_layout = html_layout
+    # Targets whose files are known to match this snapshot
+    self.targets = set()
+    # uid -> (display string, .dot node statement, html page name)
+    # in the order both files list people
+    self.nodes = {}
+    # (relation_type, uid, relative's uid) -> .dot edge statement
+    self.edges = {}
+    # .dot rank statement for each generation
+    self.ranks = []
+    # Every edge's key in .dot (and html page) order.  Spouses can
+    # repeat.
+    self.edge_keys = []
+
+  def matches(self, liny, style, layout="graphviz", html_layout="browser"):
+    return self.liny == liny and self.style == style and \
+        self.layout == layout and self.html_layout == html_layout
+
+
+def _render_snapshot(family, liny, style, old, layout="graphviz",
+    html_layout="browser"):
+  """
+  Render `family` reusing whatever `old`, a RenderSnapshot, already
+  has for unchanged people and relations.  Returns the new snapshot,
+  the .dot file's lines, whether they differ from what `old`
+  describes and whether the html page does.
+  """
+  from collections import Counter
 
-def generate_files(toml_filename, file_basename, liny, style):
+  _check_liny(liny)
+  label = family.labeller(style)
+  new = RenderSnapshot(liny, style, layout, html_layout)
+
+  dot_lines = ["digraph family_tree {"]
+  dot_changed = len(family.persons()) != len(old.nodes)
+  for person in family.persons():
+    name = label(person)
+    node = old.nodes.get(person.uid)
+    if node == None or node[0] != name:
+      node = (name, _dot_node_statement(person.uid, name), _d3_name(name))
+      dot_changed = True
+    new.nodes[person.uid] = node
+    dot_lines.append(node[1])
+
+  new.ranks = [_dot_rank_statement(generation)
+      for generation in family.generations()]
+  dot_changed = dot_changed or new.ranks != old.ranks
+  dot_lines.extend(new.ranks)
+
+  for relation_type, person, relatives in _family_relations(family, liny):
+    for relative in relatives:
+      edge_key = (relation_type, person.uid, relative.uid)
+      statement = old.edges.get(edge_key)
+      if statement == None:
+        statement = _DOT_EDGE_STATEMENTS[relation_type].format(
+            person.uid, relative.uid)
+      new.edges[edge_key] = statement
+      new.edge_keys.append(edge_key)
+      dot_lines.append(statement)
+  dot_lines.append("}")
+
+  dot_changed = dot_changed or \
+      Counter(new.edge_keys) != Counter(old.edge_keys)
+  # The html page numbers people in order, so it changes with that
+  # too
+  html_changed = list(new.nodes.items()) != list(old.nodes.items()) or \
+      new.edge_keys != old.edge_keys
+  return new, dot_lines, dot_changed, html_changed
+
+
+def render_files_incrementally(family, file_basename, liny, style,
+    targets=RENDER_TARGETS, snapshot=None, layout="graphviz",
+    html_layout="browser"):
+  """
+  Like `render_files`, but only render the people and relations
+  that changed since `snapshot`, the RenderSnapshot returned by the
+  previous call, and only rewrite outputs whose contents changed.
+  In particular graphviz isn't run at all if the .dot file would be
+  the same.  Returns the RenderSnapshot to pass next time.
+  """
+  _check_layout(layout)
+  _check_html_layout(html_layout)
+  if snapshot == None or \
+      not snapshot.matches(liny, style, layout, html_layout):
+    snapshot = RenderSnapshot(liny, style, layout, html_layout)
+
+  new, dot_lines, dot_changed, html_changed = \
+      _render_snapshot(family, liny, style, snapshot, layout, html_layout)
+  if html_layout in ("precomputed", "canvas"):
+    # Where everyone goes depends on all the same things the .dot
+    # file does
+    html_changed = html_changed or dot_changed
+
+  def stale(target, changed):
+    return target in targets and (changed or
+        target not in snapshot.targets or
+        not os.path.exists('{}.{}'.format(file_basename, target)))
+
+  # The .svg file is laid out from the same people and relations
+  # as the .dot file, so it's stale exactly when that is
+  dot_targets = [target for target in ("dot", "svg")
+      if stale(target, dot_changed)]
+  jobs = []
+  if "svg" in dot_targets and layout == "layered":
+    dot_targets.remove("svg")
+    jobs.append(("svg", _write_fragments,
+        svg_file_generator(family, liny, style),
+        '{}.svg'.format(file_basename), "\n"))
+  if dot_targets:
+    jobs.append(("dot/svg", _write_dot_and_svg_files, dot_lines,
+        file_basename, dot_targets))
+  if stale("html", html_changed) and html_layout == "canvas":
+    jobs.append(("html", _write_fragments,
+        canvas_html_page_generator(family, liny, style),
+        '{}.html'.format(file_basename)))
+  elif stale("html", html_changed):
+    index = {uid: i for i, uid in enumerate(new.nodes)}
+    positions = None
+    if html_layout == "precomputed":
+      placed = force_layout(family, liny)
+      positions = [placed[uid] for uid in new.nodes]
+    jobs.append(("html", _write_fragments,
+        _d3_html_page([node[2] for node in new.nodes.values()],
+        [(index[source], index[target], RELATION_TYPE_CODES[relation_type])
+            for relation_type, source, target in new.edge_keys],
+        positions),
+        '{}.html'.format(file_basename)))
+  _run_render_jobs(jobs)
+
+  unchanged = {"dot": not dot_changed, "svg": not dot_changed,
+      "html": not html_changed}
+  new.targets = set(targets) | {target for target in snapshot.targets
+      if unchanged[target]}
+  return new
+
+
+def exit_unless_drawable(family):
+  """
+  Say so in red and exit if `family` can't be drawn because someone
+  is their own ancestor
+  """
+  try:
+    family.generations()
+  except GenealogicalError as e:
+    print(f"\n\033[91m{e}\033[0m\n")
+    exit(1)
+
+
+def generate_files(toml_filename, file_basename, liny, style, use_cache=True,
+    targets=RENDER_TARGETS, incremental=False, root=None, depth=None,
+    layout="graphviz", html_layout="browser"):
+  """
+  Generate the `targets` from `toml_filename`.  With a `root` uid,
+  only that person's lineage, `depth` generations each way, is
+  rendered.  `layout` and `html_layout` are as for `render_files`.
+  """
 
   # Open the toml file or fail gracefully
   try:
-    family = toml_to_family(toml_filename)
+    if use_cache:
+      family = cached_toml_to_family(toml_filename)
+    else:
+      family = toml_to_family(toml_filename)
   except IOError as e:
     print(f"\n\033[91mCouldn't open {toml_filename}\033[0m\n")
     exit(1)
 
-  # Generate d3 html page
-  with open('{}.html'.format(file_basename), 'w') as f:
-    for line in d3_html_page_generator(family, liny, style):
-      f.write(line)
+  if root != None:
+    try:
+      family = family.lineage(family.uid_to_person(root), depth)
+    except TypeError as e:
+      print(f"\n\033[91m{e}\033[0m\n")
+      exit(1)
 
-  # Generate graphviz .dot file
-  with open('{}.dot'.format(file_basename), 'w') as f:
-    for line in dot_file_generator(family, liny, style):
-      f.write(line + "\n")
+  exit_unless_drawable(family)
 
-  # Generate .svg from .dot file
-  with open('{}.svg'.format(file_basename), 'w') as svg_file:
+  try:
+    if incremental:
+      snapshot_filename = file_basename + SNAPSHOT_SUFFIX
+      snapshot = render_files_incrementally(family, file_basename, liny,
+          style, targets, _read_keyed_pickle(snapshot_filename,
+          SNAPSHOT_FORMAT_VERSION, RenderSnapshot), layout, html_layout)
+      _write_keyed_pickle(snapshot_filename, SNAPSHOT_FORMAT_VERSION,
+          snapshot)
+    else:
+      render_files(family, file_basename, liny, style, targets, layout,
+          html_layout)
+      if os.path.exists(file_basename + SNAPSHOT_SUFFIX):
+        # The files it describes have just been replaced
+        os.remove(file_basename + SNAPSHOT_SUFFIX)
+  except RenderError as e:
+    print(f"\n\033[91m{e}\033[0m\n")
+    exit(1)
+
+
+def _batch_worker(toml_filename, liny, style, use_cache, targets,
+    layout="graphviz", html_layout="browser"):
+  """
+  Generate the outputs for one file of a batch, returning
+  `(toml_filename, seconds taken, error message or None)`.
+  """
+  start = time.perf_counter()
+  try:
+    if not os.path.exists(toml_filename):
+      raise IOError(f"Couldn't open {toml_filename}")
+    if use_cache:
+      family = cached_toml_to_family(toml_filename)
+    else:
+      family = toml_to_family(toml_filename)
+    render_files(family, batch_base_filename(toml_filename), liny, style,
+        targets, layout, html_layout)
+  except Exception as e:
+    return toml_filename, time.perf_counter() - start, \
+        f"{type(e).__name__}: {e}"
+  return toml_filename, time.perf_counter() - start, None
+
+
+def batch_base_filename(toml_filename):
+  """XXX.toml's outputs in a batch are XXX.html, XXX.svg, ..."""
+  base, extension = os.path.splitext(toml_filename)
+  return base if extension == ".toml" else toml_filename
+
+
+def expand_toml_patterns(patterns):
+  """
+  Expand any glob patterns among `patterns`, keeping each file
+  once in the order given.  Patterns matching nothing are kept
+  as they are so that they get reported as missing.
+  """
+  import glob
+  filenames = {}
+  for pattern in patterns:
+    matches = sorted(glob.glob(pattern)) if glob.has_magic(pattern) \
+        else [pattern]
+    for filename in matches or [pattern]:
+      filenames[filename] = None
+  return list(filenames)
+
+
+def batch_generate_files(toml_patterns, liny, style, use_cache=True,
+    targets=RENDER_TARGETS, jobs=None, layout="graphviz",
+    html_layout="browser"):
+  """
+  `generate_files` for every .toml file matched by `toml_patterns`,
+  spread over a pool of `jobs` processes (one per CPU by default)
+  that each load pedigree once and then take file after file.
+
+  Prints how long each file took or why it failed as they finish
+  and returns the number of failures.
+  """
+  from concurrent.futures import ProcessPoolExecutor, as_completed
+
+  toml_filenames = expand_toml_patterns(toml_patterns)
+  start = time.perf_counter()
+  failures = 0
+  with ProcessPoolExecutor(max_workers=jobs) as pool:
+    pending = [
+      pool.submit(_batch_worker, toml_filename, liny, style, use_cache,
+          targets, layout, html_layout)
+      for toml_filename in toml_filenames
+    ]
+    for job in as_completed(pending):
+      toml_filename, seconds, error = job.result()
+      if error == None:
+        print(f"{seconds:8.3f}s  {toml_filename}")
+      else:
+        failures += 1
+        print(f"\033[91m  FAILED  {toml_filename}: {error}\033[0m")
+
+  print(f"{len(toml_filenames) - failures} of {len(toml_filenames)} "
+      f"files generated in {time.perf_counter() - start:.3f}s")
+  return failures
+
+
+def _file_state(filename):
+  """What changes about `filename` when it's saved, or None if it's gone"""
+  try:
+    stat = os.stat(filename)
+  except OSError:
+    return None
+  return (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+
+class FamilyWatcher:
+  """
+  Keeps the family read from `toml_filename`, and what was last
+  rendered for it, in memory and regenerates the outputs
+  incrementally whenever the .toml file is saved.
+
+  Editors often save in several steps, so a change is only acted on
+  once the file has stayed the same for `debounce` seconds.
+  """
+  def __init__(self, toml_filename, file_basename, liny, style,
+      targets=RENDER_TARGETS, debounce=0.3, layout="graphviz",
+      html_layout="browser"):
+    self.toml_filename = toml_filename
+    self.file_basename = file_basename
+    self.liny = liny
+    self.style = style
+    self.targets = targets
+    self.layout = layout
+    self.html_layout = html_layout
+    self.debounce = debounce
+    self.family = None
+    self.snapshot = None
+    # The .toml file's state when last rebuilt from and the state
+    # (and since when) it's in now if that's different
+    self._built_state = None
+    self._pending_state = None
+    self._pending_since = None
+
+  def changed(self, now=None):
+    """
+    Whether the .toml file has changed since the last rebuild and
+    then stayed unchanged for `debounce` seconds
+    """
+    if now == None:
+      now = time.monotonic()
+    state = _file_state(self.toml_filename)
+    if state == None or state == self._built_state:
+      self._pending_state = None
+      return False
+    if state != self._pending_state:
+      self._pending_state = state
+      self._pending_since = now
+    return now - self._pending_since >= self.debounce
+
+  def rebuild(self):
+    """
+    Re-read the .toml file and regenerate whatever changed, returning
+    how many seconds that took
+    """
+    start = time.perf_counter()
+    self._built_state = _file_state(self.toml_filename)
+    self._pending_state = None
+    # Only replace what was last built once the new family is sound
+    family = toml_to_family(self.toml_filename)
+    family.generations()
+    self.snapshot = render_files_incrementally(family,
+        self.file_basename, self.liny, self.style, self.targets,
+        self.snapshot, self.layout, self.html_layout)
+    self.family = family
+    return time.perf_counter() - start
+
+  def rebuild_and_log(self):
+    """
+    `rebuild`, saying how long it took or why it couldn't.  A broken
+    save leaves the last outputs as they were, to be rebuilt at the
+    next save.
+    """
+    import toml
     try:
-      subprocess.Popen(['dot', '-Tsvg', '{}.dot'.format(file_basename)],
-          stdout=svg_file)
-    except FileNotFoundError as e:
-      print("'dot' executable not available.  You need to install 'graphviz'")
-      print("from your package manager if you want to get an .svg file.")
+      seconds = self.rebuild()
+    except toml.decoder.TomlDecodeError:
+      # toml_to_family has already said so
+      return
+    except (OSError, RenderError, TypeError, ValueError, GenderError,
+        GenealogicalError, PersonExistsError) as e:
+      print(f"\033[91m{time.strftime('%H:%M:%S')}  "
+          f"Couldn't rebuild from {self.toml_filename}: {e}\033[0m")
+      return
+    print(f"{time.strftime('%H:%M:%S')}  rebuilt {len(self.family.persons())} "
+        f"people from {self.toml_filename} in {seconds * 1000:.1f}ms")
+
+  def run(self, interval=0.1):
+    """Rebuild now and then after every change until interrupted"""
+    print(f"Watching {self.toml_filename}.  Press Ctrl-C to stop.")
+    self.rebuild_and_log()
+    while True:
+      time.sleep(interval)
+      if self.changed():
+        self.rebuild_and_log()
+
+
+# XXX-explorer is the directory `write_explorer` writes for XXX
+EXPLORER_SUFFIX = "-explorer"
+
+# How many uids' worth of people go in each of the explorer's chunks
+DEFAULT_CHUNK_SPAN = 1000
+
+_EXPLORER_HTML = """<!DOCTYPE html>
+<meta charset="utf-8">
+<title>Family tree</title>
+<style>
+body {
+  font: 14px sans-serif;
+  margin: 1em 2em;
+}
+
+details {
+  margin-left: 1.5em;
+}
+
+summary {
+  cursor: pointer;
+}
+
+.person > summary {
+  font-weight: bold;
+}
+
+.relatives > summary {
+  color: #666;
+}
 
+.error {
+  color: red;
+}
+</style>
+<body>
+<form id="jump">
+  <label>Go to uid <input name="uid" size="8"></label>
+  <button>Go</button>
+</form>
+<div id="tree"></div>
+<script>
+
+// People are kept in chunks/N.json by uid, index.chunk_span uids to
+// a chunk.  Chunks are only fetched once someone in them is shown.
+var index, chunks = {};
+
+function record(uid) {
+  var chunk = Math.floor(uid / index.chunk_span);
+  if (!(chunk in chunks)) {
+    chunks[chunk] = fetch("chunks/" + chunk + ".json").then(function(reply) {
+      if (!reply.ok) {
+        throw new Error("Couldn't load chunk " + chunk);
+      }
+      return reply.json();
+    });
+  }
+  return chunks[chunk].then(function(people) {
+    if (!(uid in people)) {
+      throw new Error("No person has UID " + uid);
+    }
+    return people[uid];
+  });
+}
+
+function element(tag, className, text) {
+  var made = document.createElement(tag);
+  made.className = className;
+  if (text !== undefined) {
+    made.textContent = text;
+  }
+  return made;
+}
+
+function showError(parent, error) {
+  parent.appendChild(element("div", "error", error.message));
+}
+
+// A `details` for one kind of relative, filled in when first opened
+function relatives(title, uids) {
+  var details = element("details", "relatives");
+  details.appendChild(element("summary", "", title + " (" + uids.length + ")"));
+  details.addEventListener("toggle", function() {
+    if (!details.open || details.filled) {
+      return;
+    }
+    details.filled = true;
+    uids.forEach(function(uid) {
+      details.appendChild(person(uid));
+    });
+  });
+  return details;
+}
+
+function person(uid) {
+  var details = element("details", "person");
+  var summary = element("summary", "", "UID " + uid);
+  details.appendChild(summary);
+  record(uid).then(function(someone) {
+    summary.textContent = someone.name;
+    var parents = [someone.father, someone.mother].filter(function(parent) {
+      return parent !== undefined;
+    });
+    [["Parents", parents], ["Spouses", someone.spouses || []],
+        ["Children", someone.children || []]].forEach(function(kind) {
+      if (kind[1].length) {
+        details.appendChild(relatives(kind[0], kind[1]));
+      }
+    });
+  }).catch(function(error) {
+    showError(details, error);
+  });
+  return details;
+}
+
+function show(uid) {
+  var tree = document.getElementById("tree");
+  tree.textContent = "";
+  var shown = person(uid);
+  shown.open = true;
+  tree.appendChild(shown);
+}
+
+document.getElementById("jump").addEventListener("submit", function(event) {
+  event.preventDefault();
+  var uid = parseInt(event.target.uid.value, 10);
+  if (!isNaN(uid)) {
+    show(uid);
+  }
+});
+
+fetch("index.json").then(function(reply) {
+  return reply.json();
+}).then(function(loaded) {
+  index = loaded;
+  document.title = index.people + " people";
+  if (index.start === null) {
+    document.getElementById("tree").textContent = "Nobody to show.";
+  } else {
+    show(index.start);
+  }
+}).catch(function() {
+  showError(document.getElementById("tree"), new Error("Couldn't load " +
+      "index.json.  Browsers won't load it from a file, so serve this " +
+      "directory, e.g. with `pedigree serve`."));
+});
+
+</script>
+</body>
+</html>
+"""
+
+
+def explorer_chunks(family, liny, style, chunk_span=DEFAULT_CHUNK_SPAN):
+  """
+  Split everyone into chunks of `chunk_span` uids, uid // chunk_span
+  being the chunk number: a dict of chunk number to a dict of uid to
+  that person's name and relatives' uids, the relations being the
+  ones `liny` includes.
+  """
+  _check_liny(liny)
+  label = family.labeller(style)
+  records = {person.uid: {"name": label(person)}
+      for person in family.persons()}
+  for relation_type, person, relatives in _family_relations(family, liny):
+    if relation_type == "spouse":
+      for spouse in relatives:
+        records[person.uid].setdefault("spouses", {})[spouse.uid] = None
+        records[spouse.uid].setdefault("spouses", {})[person.uid] = None
+    else:
+      for child in relatives:
+        records[person.uid].setdefault("children", {})[child.uid] = None
+        records[child.uid][relation_type] = person.uid
+
+  chunks = {}
+  for uid, record in records.items():
+    for key in ("spouses", "children"):
+      if key in record:
+        record[key] = list(record[key])
+    chunks.setdefault(uid // chunk_span, {})[uid] = record
+  return chunks
+
+
+def _write_if_changed(filename, contents):
+  """Write the bytes `contents` to `filename` unless it has them already"""
+  try:
+    with open(filename, 'rb') as f:
+      if f.read() == contents:
+        return False
+  except OSError:
+    pass
+  with open(filename, 'wb') as f:
+    f.write(contents)
+  return True
+
+
+def write_explorer(family, directory, liny, style, root=None,
+    chunk_span=DEFAULT_CHUNK_SPAN):
+  """
+  Write a page to `directory` that browses the family a few people
+  at a time: index.html and index.json, which are the same size
+  however big the family is, and the people in chunks/N.json, which
+  the page only fetches once it shows someone in them.  It starts
+  with the person with uid `root`, or the first person.  An empty
+  family gets a page with nobody to show.
+
+  Chunks that haven't changed since the last time are left alone
+  and ones nobody's in any more are removed.  Returns how many
+  chunks were written.
+  """
+  if root != None:
+    start = family.uid_to_person(root).uid
+  else:
+    start = next((person.uid for person in family.persons()), None)
+
+  chunks_directory = os.path.join(directory, "chunks")
+  os.makedirs(chunks_directory, exist_ok=True)
+  _write_if_changed(os.path.join(directory, "index.html"),
+      _EXPLORER_HTML.encode())
+  _write_if_changed(os.path.join(directory, "index.json"), json.dumps({
+    "chunk_span": chunk_span,
+    "people": len(family.persons()),
+    "start": start,
+  }).encode())
+
+  written = 0
+  chunk_filenames = set()
+  for number, people in explorer_chunks(family, liny, style,
+      chunk_span).items():
+    chunk_filenames.add(f"{number}.json")
+    written += _write_if_changed(
+        os.path.join(chunks_directory, f"{number}.json"),
+        json.dumps(people, separators=(',', ':')).encode())
+  for filename in os.listdir(chunks_directory):
+    if re.fullmatch(r"-?\d+\.json", filename) and \
+        filename not in chunk_filenames:
+      os.remove(os.path.join(chunks_directory, filename))
+  return written
+
+
+def serve_explorer(directory, port=8000):
+  """Serve `directory`, as written by `write_explorer`, on localhost"""
+  import functools
+  import http.server
+
+  handler = functools.partial(http.server.SimpleHTTPRequestHandler,
+      directory=directory)
+  with http.server.ThreadingHTTPServer(("127.0.0.1", port), handler) \
+      as server:
+    print(f"Serving {directory} at http://127.0.0.1:{port}/  "
+        "Press Ctrl-C to stop.")
+    server.serve_forever()
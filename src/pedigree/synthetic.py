@@ -0,0 +1,162 @@
+"""
+Reproducible made up families of any size, for benchmarks and tests.
+
+    >>> big_dict = synthetic_big_dict(1000, seed=1)
+    >>> len(big_dict['people'])
+    1000
+    >>> synthetic_big_dict(1000, seed=1) == big_dict
+    True
+"""
+
+import json
+import random
+
+
+GIVEN_NAMES = {
+  "m": ["Adam", "Bert", "Carl", "Dan", "Ed", "Fred", "Gus", "Hal", "Ike",
+      "Joe", "Ken", "Lou", "Max", "Ned", "Otto", "Pete", "Ray", "Sam"],
+  "f": ["Ann", "Bea", "Cleo", "Dot", "Eve", "Fay", "Gail", "Hope", "Ida",
+      "Joy", "Kay", "Liz", "May", "Nell", "Opal", "Pearl", "Rose", "Sue"],
+}
+
+SURNAMES = ["Flintstone", "Rubble", "Slaghoople", "McBricker", "Hardrock",
+    "Gravelberry", "Rockhead", "Shale", "Boulder", "Pebble", "Quarry",
+    "Cobble", "Granite", "Basalt", "Marble", "Slate", "Flint", "Cragg"]
+
+
+def _poisson(rng, mean):
+  """How many events happen when `mean` are expected (Knuth's method)"""
+  limit = 2.718281828459045 ** -mean
+  count = 0
+  product = rng.random()
+  while product > limit:
+    count += 1
+    product *= rng.random()
+  return count
+
+
+def synthetic_big_dict(people, generations=8, fertility=2.5, remarriage=0.1,
+    collapse=0.05, seed=0):
+  """
+  Return a dict shaped like a loaded .toml file, ready for
+  `dict_to_family`, with `people` people in `generations` equal
+  generations (the last one gets whatever is left).
+
+  Each generation pairs its men and women into couples, who have
+  `fertility` children on average.  A man marries again with
+  probability `remarriage`, and marries a cousin (someone sharing a
+  grandparent), if there's one free, with probability `collapse`.
+  Each generation is topped up with people marrying in, without
+  parents, or cut short once it's full.  The same arguments always
+  give the same family.
+  """
+  rng = random.Random(seed)
+  big_dict = {'father': [], 'mother': [], 'spouse': [], 'people': []}
+  per_generation = max(2, -(-people // generations))
+  # uid -> (father uid, mother uid) for everyone with parents
+  parents_of = {}
+
+  def add_person(gender, surname=None):
+    uid = len(big_dict['people']) + 1
+    big_dict['people'].append({
+      'uid': uid,
+      'given_names': [rng.choice(GIVEN_NAMES[gender])
+          for _ in range(rng.choice((1, 1, 2)))],
+      'surname': surname or rng.choice(SURNAMES),
+      'gender': gender,
+    })
+    return uid
+
+  def grandparents(uid):
+    return {grandparent for parent in parents_of.get(uid, ())
+        for grandparent in parents_of.get(parent, ())}
+
+  def pair_up(generation):
+    """Couples `(husband, wife)` from the people in `generation`"""
+    men = [uid for uid in generation if uid % 2 == 0]
+    women = [uid for uid in generation if uid % 2 == 1]
+    rng.shuffle(men)
+    rng.shuffle(women)
+    free = dict.fromkeys(women)
+    cousins = {}
+    for woman in women:
+      for grandparent in grandparents(woman):
+        cousins.setdefault(grandparent, []).append(woman)
+
+    def take(man):
+      if rng.random() < collapse:
+        for grandparent in grandparents(man):
+          for woman in cousins.get(grandparent, ()):
+            if woman in free and \
+                parents_of.get(woman) != parents_of.get(man):
+              del free[woman]
+              return woman
+      while women:
+        woman = women.pop()
+        if woman in free:
+          del free[woman]
+          return woman
+      return None
+
+    couples = []
+    for man in men:
+      for marriage in range(2):
+        if marriage == 1 and rng.random() >= remarriage:
+          break
+        wife = take(man)
+        if wife == None:
+          break
+        couples.append((man, wife))
+    return couples
+
+  # Even uids are men and odd ones women
+  def add_immigrant(generation):
+    gender = "m" if len(big_dict['people']) % 2 else "f"
+    generation.append(add_person(gender))
+
+  generation = []
+  while len(generation) < min(per_generation, people):
+    add_immigrant(generation)
+
+  while len(big_dict['people']) < people:
+    size = min(per_generation, people - len(big_dict['people']))
+    couples = pair_up(generation)
+    big_dict['spouse'].extend([husband, wife] for husband, wife in couples)
+    rng.shuffle(couples)
+
+    next_generation = []
+    for husband, wife in couples:
+      for _ in range(_poisson(rng, fertility)):
+        if len(next_generation) >= size:
+          break
+        gender = "m" if len(big_dict['people']) % 2 else "f"
+        surname = big_dict['people'][husband - 1]['surname']
+        child = add_person(gender, surname)
+        parents_of[child] = (husband, wife)
+        big_dict['father'].append([husband, child])
+        big_dict['mother'].append([wife, child])
+        next_generation.append(child)
+    while len(next_generation) < size:
+      add_immigrant(next_generation)
+    generation = next_generation
+
+  return big_dict
+
+
+def write_synthetic_toml(filename, people, **parameters):
+  """
+  Write `synthetic_big_dict(people, **parameters)` to `filename` as a
+  .toml file `toml_to_family` can read, laid out like the example
+  one, and return the dict
+  """
+  big_dict = synthetic_big_dict(people, **parameters)
+  with open(filename, 'w') as toml_file:
+    for relation in ("father", "mother", "spouse"):
+      toml_file.write(f"{relation} = {json.dumps(big_dict[relation])}\n\n")
+    for person in big_dict['people']:
+      toml_file.write("[[people]]\n"
+          f"surname = {json.dumps(person['surname'])}\n"
+          f"given_names = {json.dumps(person['given_names'])}\n"
+          f"gender = {json.dumps(person['gender'])}\n"
+          f"uid = {person['uid']}\n\n")
+  return big_dict
@@ -1,9 +1,12 @@
-from pedigree import pedigree_lib
+from pedigree import pedigree_lib, synthetic
 import pytest
 import networkx as nx
 import copy
 import sys
 import os
+import toml
+import re
+import json
 
 @pytest.fixture
 def example_yaml_path():
@@ -449,3 +452,888 @@ def test_dot_file_generator(example2_yaml_path, example2_dot_path):
       received = "\n".join(pedigree_lib.dot_file_generator(
           pedigree_lib.yaml_to_family(input_file))) + "\n"
       assert(received == output_file.read())
+
+
+@pytest.fixture
+def flintstones_toml_path(tmp_path):
+  path = str(tmp_path / "flintstones.toml")
+  pedigree_lib.create_example_toml(path)
+  return path
+
+@pytest.fixture(params=sorted(pedigree_lib.GRAPH_BACKENDS))
+def flintstones(flintstones_toml_path, request):
+  return pedigree_lib.toml_to_family(flintstones_toml_path,
+      backend=request.param)
+
+def test_flintstones_relation_indexes(flintstones):
+  uid = flintstones.uid_to_person
+  assert flintstones.fathers() == {uid(2), uid(7), uid(9), uid(12),
+      uid(4), uid(3)}
+  assert flintstones.mothers() == {uid(5), uid(10), uid(1), uid(15),
+      uid(11), uid(8)}
+  assert flintstones.spouses() == {uid(9)}
+  assert flintstones.children(uid(2)) == {uid(7), uid(16)}
+  assert flintstones.children(uid(11)) == {uid(6), uid(13)}
+  assert flintstones.children(uid(14)) == set()
+  assert flintstones.father(uid(11)) == uid(9)
+  assert flintstones.mother(uid(11)) == uid(15)
+  assert flintstones.father(uid(2)) == None
+  assert flintstones.all_spouses(uid(9)) == [uid(14)]
+  assert flintstones.all_spouses(uid(14)) == []
+
+def test_relation_indexes_follow_additions(flintstones):
+  uid = flintstones.uid_to_person
+  dino = pedigree_lib.Person(17, given_names=["Dino"], gender="m")
+  flintstones.add_child(uid(9), dino)
+  flintstones.add_spouse(uid(9), uid(15))
+  assert flintstones.father(dino) == uid(9)
+  assert flintstones.children(uid(9)) == {uid(11), dino}
+  assert flintstones.all_spouses(uid(9)) == [uid(14), uid(15)]
+  assert flintstones.children(dino) == set()
+
+def test_uid_index(flintstones):
+  assert sorted(flintstones.uids()) == list(range(1, 17))
+  assert flintstones.has_uid(9)
+  assert not flintstones.has_uid(17)
+  assert flintstones.uid_to_person(9).given_names == \
+      ("Frederick", "Joseph")
+  with pytest.raises(TypeError):
+    flintstones.uid_to_person(17)
+
+  # People added implicitly through a relation are indexed too
+  dino = pedigree_lib.Person(17, given_names=["Dino"], gender="m")
+  flintstones.add_child(flintstones.uid_to_person(9), dino)
+  assert flintstones.has_uid(17)
+  assert flintstones.uid_to_person(17) is dino
+
+def test_dict_to_family(capsys):
+  family = pedigree_lib.dict_to_family({
+    'people': [
+      {'uid': 1, 'given_names': ["Fred"], 'gender': "m"},
+      {'uid': 2, 'given_names': ["Wilma"], 'gender': "f"},
+      {'uid': 3, 'given_names': ["Pebbles"], 'gender': "f"},
+      {'uid': 3, 'given_names': ["Duplicate"], 'gender': "f"},
+    ],
+    'father': [[1, 3], [1, 3]],
+    'mother': [[2, 3], [4, 3]],
+    'spouse': [[1, 2], [1, 2]],
+  })
+  assert "Nobody has uid 4" in capsys.readouterr().out
+  assert sorted(family.uids()) == [1, 2, 3]
+  assert family.uid_to_person(3).given_names == ("Pebbles",)
+  assert family.children(family.uid_to_person(1)) == \
+      {family.uid_to_person(3)}
+  assert family.mother(family.uid_to_person(3)) == \
+      family.uid_to_person(2)
+  assert family.all_spouses(family.uid_to_person(1)) == \
+      [family.uid_to_person(2)]
+
+def test_cached_toml_to_family(flintstones_toml_path):
+  cache_path = pedigree_lib.cache_filename_for(flintstones_toml_path)
+  assert not os.path.exists(cache_path)
+
+  # Cold run writes the cache, warm run reads it
+  cold = pedigree_lib.cached_toml_to_family(flintstones_toml_path)
+  assert os.path.exists(cache_path)
+  warm = pedigree_lib.cached_toml_to_family(flintstones_toml_path)
+  assert sorted(warm.uids()) == sorted(cold.uids())
+  assert warm.children(warm.uid_to_person(11)) == \
+      {warm.uid_to_person(6), warm.uid_to_person(13)}
+
+  # Editing the toml file makes the cache stale
+  with open(flintstones_toml_path, 'a') as toml_file:
+    toml_file.write('\n[[people]]\ngiven_names = ["Dino"]\nuid = 17\n')
+  assert pedigree_lib.cached_toml_to_family(
+      flintstones_toml_path).has_uid(17)
+
+  # A corrupt cache gets rebuilt
+  with open(cache_path, 'wb') as cache_file:
+    cache_file.write(b"not a pickle")
+  assert pedigree_lib.cached_toml_to_family(
+      flintstones_toml_path).has_uid(17)
+  assert pedigree_lib._read_keyed_pickle(cache_path, None,
+      pedigree_lib.Family) is None
+
+def test_person_is_compact():
+  fred = pedigree_lib.Person(9, surname="Flint" + "stone",
+      given_names=["Frederick", "Joseph"], gender="m")
+  pebbles = pedigree_lib.Person(11, surname="Flintstone",
+      given_names=["Pebbles"], gender="f")
+  assert not hasattr(fred, '__dict__')
+  assert fred.surname is pebbles.surname
+  assert fred.given_names == ("Frederick", "Joseph")
+  assert fred.notes == ()
+
+def test_person_table(flintstones):
+  table = pedigree_lib.PersonTable(flintstones.persons())
+  assert len(table) == 16
+  assert 14 in table and 17 not in table
+  secret = table.uid_to_person(14)
+  assert secret.surname == "Ex-Wife"
+  assert secret.notes == ("Gossip", "More gossip")
+  assert table.uid_to_person(9).nickname == "Fred"
+  assert table.uid_to_person(1).nickname == None
+  with pytest.raises(TypeError):
+    table.uid_to_person(17)
+
+  # uids needn't be added in order
+  table.add(pedigree_lib.Person(0, given_names=["Zero"]))
+  table.add(pedigree_lib.Person(9, given_names=["Not", "Fred"]))
+  assert len(table) == 17
+  assert table.uid_to_person(0).given_names == ("Zero",)
+  assert table.uid_to_person(9).given_names == ("Frederick", "Joseph")
+
+  # A Family can be built on top of the table
+  family = pedigree_lib.Family(table)
+  assert sorted(family.uids()) == sorted(table.uids())
+  assert family.uid_to_person(15).given_names == ("Wilma", "Pebbles")
+
+def test_change_name(flintstones):
+  fred = flintstones.uid_to_person(9)
+  flintstones.change_name(fred, "Fred Jay Flintstone")
+  assert fred.given_names == ("Fred", "Jay")
+  assert fred.surname == "Flintstone"
+  for blank in ("", "  "):
+    with pytest.raises(ValueError):
+      flintstones.change_name(fred, blank)
+  assert str(fred) == "Fred Jay Flintstone"
+
+def test_graph_backends_agree(flintstones_toml_path):
+  compact, networkx = [
+    pedigree_lib.toml_to_family(flintstones_toml_path, backend=backend)
+    for backend in ("compact", "networkx")
+  ]
+  def edge_uids(family, relation_type=None):
+    return sorted((source.uid, target.uid, cur_type)
+        for source, target, cur_type
+        in family.graph.edges(relation_type))
+  assert len(edge_uids(compact)) == 17
+  assert edge_uids(compact) == edge_uids(networkx)
+  assert edge_uids(compact, "spouse") == [(9, 14, "spouse")]
+  assert list(compact.persons()) == list(networkx.persons())
+  assert len(compact.graph) == len(networkx.graph) == 16
+  for family in (compact, networkx):
+    person = family.uid_to_person
+    assert family.graph.has_edge(person(9), person(14), "spouse")
+    assert not family.graph.has_edge(person(14), person(9), "spouse")
+    assert not family.graph.has_edge(person(9), person(14), "father")
+
+  with pytest.raises(ValueError):
+    pedigree_lib.Family(backend="nonsense")
+  with pytest.raises(ValueError):
+    compact.graph.add_edge(compact.uid_to_person(1),
+        compact.uid_to_person(2), "cousin")
+
+def test_cli_import_defers_heavy_modules():
+  import subprocess
+  deferred = ("toml", "networkx", "pickle", "subprocess", "webbrowser",
+      "tempfile", "urllib.request")
+  loaded = subprocess.run([sys.executable, "-c",
+      "import sys, pedigree.main\n"
+      f"print(' '.join(m for m in {deferred!r} if m in sys.modules))"],
+      check=True, capture_output=True, text=True,
+      env=dict(os.environ, PYTHONPATH=os.path.dirname(
+          os.path.dirname(pedigree_lib.__file__)))).stdout.split()
+  assert loaded == []
+
+@pytest.fixture
+def fake_dot(tmp_path, monkeypatch):
+  """
+  Put a `dot` on the PATH that runs the given shell script, so
+  the graphviz pipeline can be tested without graphviz
+  """
+  bin_path = tmp_path / "bin"
+  bin_path.mkdir()
+  def install(script):
+    dot_path = bin_path / "dot"
+    dot_path.write_text("#!/bin/sh\n" + script + "\n")
+    dot_path.chmod(0o755)
+  monkeypatch.setenv("PATH", str(bin_path) + os.pathsep + os.environ["PATH"])
+  return install
+
+def test_render_files(flintstones, tmp_path, fake_dot):
+  fake_dot("cat")
+  base = str(tmp_path / "tree")
+  pedigree_lib.render_files(flintstones, base, "both", "full name")
+  with open(base + ".dot") as dot_file:
+    dot = dot_file.read()
+  assert dot == "".join(line + "\n" for line in
+      pedigree_lib.dot_file_generator(flintstones, "both", "full name"))
+  with open(base + ".svg") as svg_file:
+    assert svg_file.read() == dot
+  with open(base + ".html") as html_file:
+    assert html_file.read() == "".join(
+        pedigree_lib.d3_html_page_generator(flintstones, "both",
+        "full name"))
+
+  # Only the requested targets are written
+  other = str(tmp_path / "other")
+  pedigree_lib.render_files(flintstones, other, "both", "full name",
+      targets=["html"])
+  assert os.path.exists(other + ".html")
+  assert not os.path.exists(other + ".dot")
+
+def test_render_files_reports_graphviz_failure(flintstones, tmp_path,
+    fake_dot):
+  fake_dot("echo 'syntax error' >&2; exit 3")
+  base = str(tmp_path / "tree")
+  with pytest.raises(pedigree_lib.RenderError) as error:
+    pedigree_lib.render_files(flintstones, base, "both", "full name")
+  assert "status 3" in str(error.value)
+  assert "syntax error" in str(error.value)
+  # The other targets still get written
+  assert os.path.getsize(base + ".html") > 0
+  assert os.path.getsize(base + ".dot") > 0
+
+def test_batch_generate_files(tmp_path, capsys):
+  for name in ("one", "two"):
+    pedigree_lib.create_example_toml(str(tmp_path / f"{name}.toml"))
+  pattern = str(tmp_path / "*.toml")
+  missing = str(tmp_path / "missing.toml")
+  assert pedigree_lib.expand_toml_patterns([pattern, missing, pattern]) \
+      == [str(tmp_path / "one.toml"), str(tmp_path / "two.toml"), missing]
+
+  failures = pedigree_lib.batch_generate_files([pattern, missing], "both",
+      "full name", targets=["html", "dot"], jobs=2)
+  assert failures == 1
+  output = capsys.readouterr().out
+  assert "FAILED" in output and "missing.toml" in output
+  assert "2 of 3 files generated" in output
+
+  # Same outputs as generating each file on its own
+  pedigree_lib.generate_files(str(tmp_path / "one.toml"),
+      str(tmp_path / "single"), "both", "full name", targets=["html", "dot"])
+  for extension in ("html", "dot"):
+    with open(tmp_path / f"one.{extension}") as batch_file, \
+        open(tmp_path / f"single.{extension}") as single_file:
+      assert batch_file.read() == single_file.read()
+
+@pytest.mark.parametrize("chunk_size", [1, 100, pedigree_lib.DEFAULT_CHUNK_SIZE])
+def test_writers_match_generators(flintstones, chunk_size):
+  import io
+  dot, html = io.BytesIO(), io.BytesIO()
+  pedigree_lib.write_dot_file(flintstones, "both", "full name", dot,
+      chunk_size=chunk_size)
+  pedigree_lib.write_d3_html_page(flintstones, "both", "full name", html,
+      chunk_size=chunk_size)
+  assert dot.getvalue() == "".join(line + "\n" for line in
+      pedigree_lib.dot_file_generator(flintstones, "both",
+      "full name")).encode()
+  assert html.getvalue() == "".join(pedigree_lib.d3_html_page_generator(
+      flintstones, "both", "full name")).encode()
+
+@pytest.mark.parametrize("chunk_size", [1, 1000, 10 ** 6])
+def test_chunked_writer_batches(chunk_size):
+  import io
+  fragments = [str(i) for i in range(3 * pedigree_lib._FRAGMENT_BATCH + 1)]
+  stream = io.BytesIO()
+  with pedigree_lib.ChunkedWriter(stream, chunk_size=chunk_size,
+      end="\n") as writer:
+    writer.writelines(iter(fragments))
+    writer.write("last")
+  assert stream.getvalue() == "".join(fragment + "\n"
+      for fragment in fragments + ["last"]).encode()
+
+def test_chunked_writer_drops_broken_streams():
+  import io
+  class BrokenStream:
+    def write(self, data):
+      raise BrokenPipeError()
+    def flush(self):
+      pass
+  good = io.BytesIO()
+  with pedigree_lib.ChunkedWriter(BrokenStream(), good,
+      chunk_size=4) as writer:
+    writer.write("ab")
+    writer.write("cdé")
+  assert good.getvalue() == "abcdé".encode()
+  with pytest.raises(BrokenPipeError):
+    with pedigree_lib.ChunkedWriter(BrokenStream(), chunk_size=1) as writer:
+      writer.write("a")
+
+def test_display_string_cache(flintstones):
+  fred = flintstones.uid_to_person(9)
+  assert flintstones.display_string(fred, "full name") == \
+      "Frederick Joseph Flintstone (9)"
+  assert flintstones.display_string(fred, "last initial, no middle names") \
+      == "Frederick F. (9)"
+  assert flintstones.display_string(fred, "full name") is \
+      flintstones.display_string(fred, "full name")
+
+  # Name changes are noticed however they're made
+  flintstones.change_name(fred, "Fred Flintstone")
+  assert flintstones.display_string(fred, "full name") == \
+      "Fred Flintstone (9)"
+  fred.surname = "Rockhead"
+  assert flintstones.display_string(fred, "no middle names") == \
+      "Fred Rockhead (9)"
+  assert flintstones.display_string(fred, "full name") == \
+      "Fred Rockhead (9)"
+
+  with pytest.raises(ValueError):
+    flintstones.display_string(fred, "nickname")
+  with pytest.raises(ValueError):
+    fred.display_string("nickname")
+
+def save(toml_path, big_dict):
+  with open(toml_path, 'w') as toml_file:
+    toml.dump(big_dict, toml_file)
+
+def test_render_files_incrementally(flintstones_toml_path, tmp_path, fake_dot):
+  # Count graphviz runs
+  runs_path = tmp_path / "dot-runs"
+  fake_dot(f"echo run >> {runs_path}; cat")
+  def dot_runs():
+    return len(runs_path.read_text().split()) if runs_path.exists() else 0
+
+  full_base = str(tmp_path / "full")
+  base = str(tmp_path / "tree")
+  def assert_same_as_full_render(family):
+    pedigree_lib.render_files(family, full_base, "both", "full name")
+    for extension in pedigree_lib.RENDER_TARGETS:
+      with open(f"{base}.{extension}") as incremental_file:
+        with open(f"{full_base}.{extension}") as full_file:
+          assert incremental_file.read() == full_file.read()
+
+  family = pedigree_lib.toml_to_family(flintstones_toml_path)
+  snapshot = pedigree_lib.render_files_incrementally(family, base, "both",
+      "full name")
+  assert dot_runs() == 1
+  assert_same_as_full_render(family)
+
+  # Nothing changed, so nothing is rendered
+  family = pedigree_lib.toml_to_family(flintstones_toml_path)
+  snapshot = pedigree_lib.render_files_incrementally(family, base, "both",
+      "full name", snapshot=snapshot)
+  assert dot_runs() == 2
+
+  # Renamed and new people and relations are rendered
+  big_dict = toml.load(flintstones_toml_path)
+  big_dict["people"].append({"given_names": ["Dino"], "uid": 17})
+  big_dict["mother"].append([11, 17])
+  save(flintstones_toml_path, big_dict)
+  family = pedigree_lib.toml_to_family(flintstones_toml_path)
+  assert family.mother(family.uid_to_person(17)).uid == 11
+  family.change_name(family.uid_to_person(9), "Fred Flintstone")
+  snapshot = pedigree_lib.render_files_incrementally(family, base, "both",
+      "full name", snapshot=snapshot)
+  assert dot_runs() == 3
+  assert_same_as_full_render(family)
+  with open(base + ".dot") as dot_file:
+    assert '  "11" -> "17" [color=orange];\n' in dot_file.read()
+
+  # So are relations changed between the same people
+  big_dict["spouse"].append([4, 5])
+  save(flintstones_toml_path, big_dict)
+  family = pedigree_lib.toml_to_family(flintstones_toml_path)
+  family.change_name(family.uid_to_person(9), "Fred Flintstone")
+  snapshot = pedigree_lib.render_files_incrementally(family, base, "both",
+      "full name", snapshot=snapshot)
+  # One more than the full render above
+  assert dot_runs() == 5
+  assert_same_as_full_render(family)
+  with open(base + ".dot") as dot_file:
+    assert '  "4" -> "5" [style="dotted"];\n' in dot_file.read()
+
+  # A different style renders everything again
+  pedigree_lib.render_files_incrementally(family, base, "both",
+      "no middle names", snapshot=snapshot)
+  assert dot_runs() == 7
+
+def test_generate_files_incrementally(flintstones_toml_path, tmp_path,
+    fake_dot):
+  fake_dot("cat")
+  base = str(tmp_path / "tree")
+  pedigree_lib.generate_files(flintstones_toml_path, base, "both",
+      "full name", incremental=True)
+  assert os.path.exists(base + pedigree_lib.SNAPSHOT_SUFFIX)
+  html_mtime = os.stat(base + ".html").st_mtime_ns
+
+  # An unchanged family leaves the files alone
+  os.utime(base + ".html", ns=(0, 0))
+  pedigree_lib.generate_files(flintstones_toml_path, base, "both",
+      "full name", incremental=True)
+  assert os.stat(base + ".html").st_mtime_ns == 0
+
+  # A full render leaves no snapshot describing out of date files
+  pedigree_lib.generate_files(flintstones_toml_path, base, "both",
+      "full name")
+  assert not os.path.exists(base + pedigree_lib.SNAPSHOT_SUFFIX)
+
+def test_family_watcher(flintstones_toml_path, tmp_path, fake_dot):
+  fake_dot("cat")
+  base = str(tmp_path / "tree")
+  watcher = pedigree_lib.FamilyWatcher(flintstones_toml_path, base, "both",
+      "full name", debounce=1)
+  assert not watcher.changed(now=0)
+  assert watcher.changed(now=1)
+  watcher.rebuild()
+  assert watcher.family.has_uid(9)
+  assert not watcher.changed(now=0)
+
+  # Saved twice in a row, the change is only picked up once the file
+  # has settled for a second
+  big_dict = toml.load(flintstones_toml_path)
+  big_dict["people"].append({"given_names": ["Dino"], "uid": 17})
+  save(flintstones_toml_path, big_dict)
+  assert not watcher.changed(now=10)
+  big_dict["mother"].append([11, 17])
+  save(flintstones_toml_path, big_dict)
+  assert not watcher.changed(now=10.5)
+  assert not watcher.changed(now=11)
+  assert watcher.changed(now=11.5)
+
+  watcher.rebuild()
+  dino = watcher.family.uid_to_person(17)
+  assert watcher.family.mother(dino).uid == 11
+  assert not watcher.changed(now=20)
+  with open(base + ".dot") as dot_file:
+    assert dot_file.read() == "".join(line + "\n" for line in
+        pedigree_lib.dot_file_generator(watcher.family, "both", "full name"))
+
+@pytest.mark.parametrize("breakage", [
+  # Someone who isn't there
+  lambda big_dict: big_dict["mother"].append([11, 999]),
+  # Pebbles mothering her grandfather
+  lambda big_dict: big_dict["mother"].append([11, 7]),
+])
+def test_family_watcher_survives_broken_saves(flintstones_toml_path,
+    tmp_path, fake_dot, capsys, breakage):
+  fake_dot("cat")
+  base = str(tmp_path / "tree")
+  watcher = pedigree_lib.FamilyWatcher(flintstones_toml_path, base, "both",
+      "full name")
+  watcher.rebuild_and_log()
+  with open(base + ".dot") as dot_file:
+    good_dot = dot_file.read()
+  good_family = watcher.family
+
+  big_dict = toml.load(flintstones_toml_path)
+  broken = copy.deepcopy(big_dict)
+  breakage(broken)
+  save(flintstones_toml_path, broken)
+  watcher.rebuild_and_log()
+  assert "Couldn't rebuild" in capsys.readouterr().out
+  assert watcher.family is good_family
+  with open(base + ".dot") as dot_file:
+    assert dot_file.read() == good_dot
+
+  # Fixing the file picks up where it left off
+  big_dict["people"].append({"given_names": ["Dino"], "uid": 17})
+  save(flintstones_toml_path, big_dict)
+  assert not watcher.changed(now=0)
+  assert watcher.changed(now=1)
+  watcher.rebuild_and_log()
+  assert "rebuilt 17 people" in capsys.readouterr().out
+  assert watcher.family.has_uid(17)
+
+def test_family_equality(flintstones_toml_path):
+  big_dict = toml.load(flintstones_toml_path)
+  family = pedigree_lib.dict_to_family(big_dict)
+
+  # Built in another order, in another backend
+  reordered = {key: list(reversed(value)) for key, value in big_dict.items()}
+  same = pedigree_lib.dict_to_family(reordered, backend="networkx")
+  assert same.fingerprint() == family.fingerprint()
+  assert same == family
+  assert not (same != family)
+  assert family != None
+
+  # A relation that's already there, added again
+  father_uid, child_uid = big_dict['father'][0]
+  same.add_child(same.uid_to_person(father_uid),
+      same.uid_to_person(child_uid))
+  assert same.fingerprint() == family.fingerprint()
+  assert same == family
+
+  # One more relation
+  same.add_spouse(same.uid_to_person(9), same.uid_to_person(10))
+  assert same.fingerprint() != family.fingerprint()
+  assert same != family
+
+  # The fingerprint survives pickling, e.g. in the .toml cache
+  cached = pedigree_lib.cached_toml_to_family(flintstones_toml_path)
+  cached = pedigree_lib.cached_toml_to_family(flintstones_toml_path)
+  assert cached.fingerprint() == family.fingerprint()
+  assert cached == family
+
+def test_couples(flintstones):
+  couples = flintstones.couples()
+  uid_pairs = [(one.uid, other.uid) for one, other in couples]
+  assert len(set(uid_pairs)) == len(uid_pairs)
+  assert all(one < other for one, other in uid_pairs)
+  for father in flintstones.fathers():
+    for child in flintstones.children(father):
+      mother = flintstones.mother(child)
+      if mother:
+        assert sorted([father, mother]) in couples
+  for person in flintstones.spouses():
+    for spouse in flintstones.all_spouses(person):
+      assert sorted([person, spouse]) in couples
+
+  lazy_couples = flintstones.couples(lazily=True)
+  assert not isinstance(lazy_couples, list)
+  assert list(lazy_couples) == couples
+
+def test_ancestors_and_descendants(flintstones):
+  pebbles = flintstones.uid_to_person(11)
+  uids = lambda persons: [person.uid for person in persons]
+  assert set(uids(flintstones.ancestors(pebbles, 1))) == {9, 15}
+  assert set(uids(flintstones.ancestors(pebbles, 2))) == {9, 15, 7, 8, 12, 10}
+  assert set(uids(flintstones.ancestors(pebbles))) == \
+      {9, 15, 7, 8, 12, 10, 1, 2}
+  assert set(uids(flintstones.descendants(pebbles))) == {6, 13}
+  assert flintstones.descendants(pebbles, 0) == []
+  assert set(uids(flintstones.descendants(flintstones.uid_to_person(2)))) \
+      == {16, 7, 9, 11, 13, 6}
+
+def test_lineage(flintstones):
+  pebbles = flintstones.uid_to_person(11)
+  lineage = flintstones.lineage(pebbles, max_depth=1)
+  assert lineage.family is flintstones
+  assert set(lineage.uids()) == {11, 9, 15, 13, 6}
+  assert lineage.children(pebbles) == {flintstones.uid_to_person(6),
+      flintstones.uid_to_person(13)}
+  assert lineage.all_spouses(flintstones.uid_to_person(9)) == []
+  assert lineage.spouses() == set()
+  not_ranks = lambda lines: sorted(line for line in lines
+      if "rank=same" not in line)
+  assert not_ranks(pedigree_lib.dot_file_generator(lineage, "both",
+      "full name")) == not_ranks(line for line in
+          pedigree_lib.dot_file_generator(flintstones, "both", "full name")
+          if all(uid in ("11", "9", "15", "13", "6")
+              for uid in re.findall(r'"(\d+)"', line)))
+
+def test_generate_files_with_root(flintstones_toml_path, tmp_path):
+  base = str(tmp_path / "tree")
+  pedigree_lib.generate_files(flintstones_toml_path, base, "both",
+      "full name", targets=["dot"], root=11, depth=1)
+  with open(base + ".dot") as dot_file:
+    assert set(re.findall(r'^  "(\d+)" \[', dot_file.read(), re.M)) == \
+        {"11", "9", "15", "13", "6"}
+
+def test_relationship(flintstones):
+  person = flintstones.uid_to_person
+  relationship = flintstones.relationship(person(13), person(6))
+  assert relationship.name == "sister"
+  assert set(relationship.common_ancestors) == {person(3), person(11)}
+  assert (relationship.generations_up_from_a,
+      relationship.generations_up_from_b) == (1, 1)
+  assert flintstones.relationship(person(8), person(11)).name == \
+      "grandmother"
+  assert flintstones.relationship(person(6), person(8)).name == \
+      "great-grandson"
+  assert flintstones.relationship(person(16), person(13)).name == \
+      "great-great-uncle"
+  assert flintstones.relationship(person(14), person(9)) == None
+
+  # Searching up from both at once agrees with comparing everyone's
+  # whole ancestry
+  pairs = [(a, b) for a in flintstones.persons()
+      for b in flintstones.persons()]
+  assert [flintstones.relationship(a, b) for a, b in pairs] == \
+      list(flintstones.relationships(pairs))
+
+def test_relationship_names():
+  assert pedigree_lib.relationship_name(2, 2) == "first cousin"
+  assert pedigree_lib.relationship_name(3, 4) == \
+      "second cousin once removed"
+  assert pedigree_lib.relationship_name(2, 5) == \
+      "first cousin 3 times removed"
+  assert pedigree_lib.relationship_name(3, 1, "f") == "great-niece"
+  assert pedigree_lib.relationship_name(1, 1) == "sibling"
+
+def test_kinship_matrix(flintstones):
+  numpy = pytest.importorskip("numpy")
+  persons = sorted(flintstones.persons())
+
+  def kinship(a, b):
+    # Straight from the definition, recursing on whoever is younger
+    if a == b:
+      father, mother = flintstones.father(a), flintstones.mother(a)
+      return 0.5 * (1 + (kinship(father, mother)
+          if father and mother else 0))
+    if b in flintstones.ancestors(a):
+      a, b = b, a
+    return 0.5 * sum(kinship(a, parent) for parent in
+        (flintstones.father(b), flintstones.mother(b)) if parent)
+
+  expected = numpy.array([[kinship(a, b) for b in persons] for a in persons])
+  assert numpy.array_equal(flintstones.kinship_matrix(persons), expected)
+
+  # Assembled from blocks
+  assembled = numpy.zeros_like(expected)
+  for row, column, block in flintstones.kinship_blocks(persons, 5):
+    assembled[row:row + block.shape[0], column:column + block.shape[1]] = block
+    assembled[column:column + block.shape[1], row:row + block.shape[0]] = \
+        block.T
+  assert numpy.array_equal(assembled, expected)
+
+def test_inbreeding_coefficient():
+  pytest.importorskip("numpy")
+  family = pedigree_lib.Family()
+  person = lambda uid, gender: pedigree_lib.Person(uid, given_names=[str(uid)],
+      gender=gender)
+  father, mother_1, mother_2, son, daughter, child = (person(1, "m"),
+      person(2, "f"), person(3, "f"), person(4, "m"), person(5, "f"),
+      person(6, "m"))
+  # Half siblings' child
+  family.add_children(father, [son, daughter])
+  family.add_children(mother_1, [son])
+  family.add_children(mother_2, [daughter])
+  family.add_children(son, [child])
+  family.add_children(daughter, [child])
+  kinship = family.kinship_matrix([child, son])
+  assert 2 * kinship[0, 0] - 1 == 1 / 8
+  assert kinship[0, 1] == 0.25 + 1 / 16
+
+def test_generations(flintstones):
+  uids = lambda generations: [sorted(person.uid for person in generation)
+      for generation in generations]
+  assert uids(flintstones.generations()) == [[1, 2], [7, 8, 10, 12, 16],
+      [4, 5, 9, 14, 15], [3, 11], [6, 13]]
+  assert flintstones.generations() is flintstones.generations()
+  assert uids(flintstones.lineage(flintstones.uid_to_person(11),
+      1).generations()) == [[9, 15], [11], [6, 13]]
+
+  # Added relations are taken into account
+  person = flintstones.uid_to_person
+  flintstones.add_child(person(12), person(14))
+  assert uids(flintstones.generations())[1] == [7, 8, 10, 12, 16]
+  assert 14 in uids(flintstones.generations())[2]
+
+  dot = list(pedigree_lib.dot_file_generator(flintstones, "both",
+      "full name"))
+  assert '  {rank=same; "6"; "13";}' in dot or \
+      '  {rank=same; "13"; "6";}' in dot
+
+def test_own_ancestor(flintstones, capsys):
+  person = flintstones.uid_to_person
+  pedigree_lib.exit_unless_drawable(flintstones)
+  # Pebbles mothering her grandfather
+  flintstones.add_child(person(11), person(7))
+  with pytest.raises(pedigree_lib.GenealogicalError, match="own ancestor"):
+    flintstones.generations()
+  with pytest.raises(SystemExit):
+    pedigree_lib.exit_unless_drawable(flintstones)
+  assert "own ancestor" in capsys.readouterr().out
+  with pytest.raises(pedigree_lib.GenealogicalError):
+    list(pedigree_lib.dot_file_generator(flintstones, "both", "full name"))
+  with pytest.raises(pedigree_lib.GenealogicalError):
+    list(pedigree_lib.d3_html_page_generator(flintstones, "both",
+        "full name"))
+
+def test_synthetic_toml(tmp_path):
+  toml_path = str(tmp_path / "synthetic.toml")
+  big_dict = synthetic.write_synthetic_toml(toml_path, 3000, generations=6,
+      remarriage=0.3, collapse=0.5, seed=7)
+  family = pedigree_lib.toml_to_family(toml_path)
+  assert family == pedigree_lib.dict_to_family(big_dict)
+  assert len(family.persons()) == 3000
+  assert 6 <= len(family.generations()) <= 8
+
+  # Some men married twice and some couples share a grandparent
+  assert any(len(family.all_spouses(person)) == 2
+      for person in family.spouses())
+  assert any(family.relationship(husband, wife) != None
+      for husband in family.spouses() for wife in family.all_spouses(husband))
+
+def test_layered_layout(flintstones):
+  layers = pedigree_lib.layered_layout(flintstones)
+  assert [sorted(person.uid for person in layer) for layer in layers] == \
+      [sorted(person.uid for person in generation)
+          for generation in flintstones.generations()]
+  layer_of = {person.uid: index for index, layer in enumerate(layers)
+      for person in layer}
+  for parent in flintstones.fathers() | flintstones.mothers():
+    for child in flintstones.children(parent):
+      assert layer_of[parent.uid] < layer_of[child.uid]
+
+def test_svg_file_generator(flintstones):
+  import xml.etree.ElementTree as ElementTree
+  svg = ElementTree.fromstring("\n".join(
+      pedigree_lib.svg_file_generator(flintstones, "both", "full name"))
+      .split("\n", 1)[1])
+  namespace = "{http://www.w3.org/2000/svg}"
+  label = flintstones.labeller("full name")
+  assert sorted(text.text for text in svg.iter(namespace + "text")) == \
+      sorted(label(person) for person in flintstones.persons())
+  relations = list(pedigree_lib._family_relations(flintstones, "both"))
+  assert len(list(svg.iter(namespace + "path"))) == \
+      sum(len(relatives) for _, _, relatives in relations)
+
+def test_render_files_layered(flintstones, tmp_path, fake_dot):
+  fake_dot("exit 1")
+  base = str(tmp_path / "tree")
+  pedigree_lib.render_files(flintstones, base, "both", "full name",
+      ("dot", "svg"), layout="layered")
+  with open(base + ".svg") as svg_file:
+    assert svg_file.read() == "".join(line + "\n" for line in
+        pedigree_lib.svg_file_generator(flintstones, "both", "full name"))
+  assert os.path.exists(base + ".dot")
+
+  snapshot = pedigree_lib.render_files_incrementally(flintstones, base,
+      "both", "full name", ("svg",), layout="layered")
+  assert snapshot.matches("both", "full name", "layered")
+  assert not snapshot.matches("both", "full name")
+  with pytest.raises(ValueError):
+    pedigree_lib.render_files(flintstones, base, "both", "full name",
+        layout="neato")
+
+def d3_data(page):
+  """The `data` embedded in a d3 html page"""
+  return json.loads(re.search(r"var data = (\{.*?\});\n", page,
+      re.DOTALL).group(1))
+
+def test_force_layout(flintstones):
+  positions = pedigree_lib.force_layout(flintstones)
+  assert sorted(positions) == sorted(flintstones.uids())
+  assert positions == pedigree_lib.force_layout(flintstones)
+  assert min(x for x, y in positions.values()) == 0
+  assert min(y for x, y in positions.values()) == 0
+  # Nobody is left on top of anybody else
+  assert len({(round(x), round(y)) for x, y in positions.values()}) == \
+      len(positions)
+
+  assert pedigree_lib.force_layout(pedigree_lib.Family()) == {}
+
+def test_precomputed_d3_html_page(flintstones, tmp_path):
+  browser = "".join(pedigree_lib.d3_html_page_generator(flintstones, "both",
+      "full name"))
+  precomputed = "".join(pedigree_lib.d3_html_page_generator(flintstones,
+      "both", "full name", "precomputed"))
+  assert ".start();" in browser and ".start();" not in precomputed
+  browser_data = d3_data(browser)
+  precomputed_data = d3_data(precomputed)
+  assert "positions" not in browser_data
+  assert len(precomputed_data.pop("positions")) == \
+      len(flintstones.persons())
+  assert browser_data == precomputed_data
+
+  base = str(tmp_path / "tree")
+  snapshot = pedigree_lib.render_files_incrementally(flintstones, base,
+      "both", "full name", ("html",), html_layout="precomputed")
+  with open(base + ".html") as html_file:
+    assert html_file.read() == precomputed
+  assert not snapshot.matches("both", "full name")
+
+  empty = "".join(pedigree_lib.d3_html_page_generator(pedigree_lib.Family(),
+      "both", "full name", "precomputed"))
+  assert d3_data(empty)["positions"] == []
+
+def test_d3_html_page_data(flintstones):
+  person = flintstones.uid_to_person
+  flintstones.change_name(person(16), "Zeke </script> Flintstone")
+  page = "".join(pedigree_lib.d3_html_page_generator(flintstones, "both",
+      "full name"))
+  assert page.count("</script>") == 2
+  data = d3_data(page)
+  label = flintstones.labeller("full name")
+  assert data["nodes"] == [label(person) for person in flintstones.persons()]
+
+  # Each relation once, by node number
+  uids = [person.uid for person in flintstones.persons()]
+  links = [(pedigree_lib.RELATION_TYPES[code], uids[source], uids[target])
+      for source, target, code in data["links"]]
+  assert len(links) == len(set(links))
+  assert ("father", 2, 7) in links
+  assert set(links) == {(relation_type, parent.uid, relative.uid)
+      for relation_type, parent, relatives
+      in pedigree_lib._family_relations(flintstones, "both")
+      for relative in relatives}
+  matrilineal = d3_data("".join(pedigree_lib.d3_html_page_generator(
+      flintstones, "matri", "full name")))
+  assert {code for _, _, code in matrilineal["links"]} == {1, 2}
+
+def test_canvas_html_page(flintstones, tmp_path):
+  page = "".join(pedigree_lib.canvas_html_page_generator(flintstones, "both",
+      "full name"))
+  assert "<canvas>" in page and "d3js.org" not in page
+  data = d3_data(page)
+  label = flintstones.labeller("full name")
+  assert sorted(data["nodes"]) == \
+      sorted(label(person) for person in flintstones.persons())
+  assert len(data["positions"]) == len(data["nodes"])
+
+  # Laid out in generations, parents above their children
+  y = {name: position[1]
+      for name, position in zip(data["nodes"], data["positions"])}
+  for parent in flintstones.fathers() | flintstones.mothers():
+    for child in flintstones.children(parent):
+      assert y[label(parent)] < y[label(child)]
+  assert len(data["links"]) == sum(len(relatives) for _, _, relatives
+      in pedigree_lib._family_relations(flintstones, "both"))
+
+  base = str(tmp_path / "tree")
+  pedigree_lib.render_files(flintstones, base, "both", "full name",
+      ("html",), html_layout="canvas")
+  with open(base + ".html") as html_file:
+    assert html_file.read() == page
+  pedigree_lib.render_files_incrementally(flintstones, base + "2", "both",
+      "full name", ("html",), html_layout="canvas")
+  with open(base + "2.html") as html_file:
+    assert html_file.read() == page
+
+def test_explorer_chunks(flintstones):
+  chunks = pedigree_lib.explorer_chunks(flintstones, "both", "full name",
+      chunk_span=5)
+  assert sorted(chunks) == sorted({uid // 5 for uid in flintstones.uids()})
+  person = flintstones.uid_to_person
+  fred = chunks[9 // 5][9]
+  assert fred["name"] == "Frederick Joseph Flintstone (9)"
+  assert (fred["father"], fred["mother"]) == (7, 8)
+  assert fred["spouses"] == [14] and fred["children"] == [11]
+  assert chunks[14 // 5][14]["spouses"] == [9]
+  assert "father" not in pedigree_lib.explorer_chunks(flintstones, "matri",
+      "full name")[0][9]
+
+def test_write_explorer(flintstones_toml_path, tmp_path):
+  family = pedigree_lib.toml_to_family(flintstones_toml_path)
+  base = str(tmp_path / "tree")
+  directory = base + pedigree_lib.EXPLORER_SUFFIX
+  assert pedigree_lib.write_explorer(family, directory, "both", "full name",
+      root=9, chunk_span=5) == 4
+  with open(os.path.join(directory, "index.json")) as index_file:
+    assert json.load(index_file) == {"chunk_span": 5, "people": 16,
+        "start": 9}
+  with open(os.path.join(directory, "chunks", "1.json")) as chunk_file:
+    assert json.load(chunk_file)["9"]["spouses"] == [14]
+
+  # Only changed chunks are written, and empty ones removed
+  assert pedigree_lib.write_explorer(family, directory, "both", "full name",
+      root=9, chunk_span=5) == 0
+  family.change_name(family.uid_to_person(9), "Fred Flintstone")
+  assert pedigree_lib.write_explorer(family, directory, "both", "full name",
+      root=9, chunk_span=5) == 1
+  pedigree_lib.write_explorer(family, directory, "both", "full name",
+      chunk_span=10)
+  assert sorted(os.listdir(os.path.join(directory, "chunks"))) == \
+      ["0.json", "1.json"]
+
+  # The page is the same however big the family is
+  with open(os.path.join(directory, "index.html")) as html_file:
+    assert html_file.read() == pedigree_lib._EXPLORER_HTML
+  with pytest.raises(TypeError):
+    pedigree_lib.write_explorer(family, directory, "both", "full name",
+        root=999)
+
+  # Nobody to start with
+  empty_directory = str(tmp_path / "empty")
+  assert pedigree_lib.write_explorer(pedigree_lib.Family(), empty_directory,
+      "both", "full name") == 0
+  with open(os.path.join(empty_directory, "index.json")) as index_file:
+    assert json.load(index_file)["start"] == None
+
+  # Chunks of negative uids are removed once they're empty too
+  family.add_person(pedigree_lib.Person(-3, surname="Rubble",
+      given_names=["Bamm-Bamm"], gender="m"))
+  pedigree_lib.write_explorer(family, directory, "both", "full name",
+      chunk_span=10)
+  assert "-1.json" in os.listdir(os.path.join(directory, "chunks"))
+  pedigree_lib.write_explorer(pedigree_lib.toml_to_family(
+      flintstones_toml_path), directory, "both", "full name", chunk_span=10)
+  assert sorted(os.listdir(os.path.join(directory, "chunks"))) == \
+      ["0.json", "1.json"]
+
+  pedigree_lib.cleanup_files(flintstones_toml_path, base)
+  assert not os.path.exists(directory)